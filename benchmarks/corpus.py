@@ -0,0 +1,96 @@
+import random
+import string
+
+
+def wide_map(scale=1.0, seed=1):
+    rnd = random.Random(seed)
+    result = {}
+    for i in range(int(5000 * scale)):
+        kind = i % 4
+        if kind == 0:
+            result["field_%d" % i] = rnd.randint(-2 ** 31, 2 ** 31)
+        elif kind == 1:
+            result["field_%d" % i] = rnd.random()
+        elif kind == 2:
+            result["field_%d" % i] = _word(rnd, 12)
+        else:
+            result["field_%d" % i] = rnd.random() < 0.5
+    return result
+
+
+def deep_nesting(scale=1.0, seed=2):
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(int(50 * scale)):
+        value = {"leaf": _word(rnd, 8), "n": rnd.randint(0, 1000)}
+        for depth in range(200):
+            value = {"level": depth, "child": value} if depth % 2 else [depth, value]
+        result.append(value)
+    return result
+
+
+def typed_vectors(scale=1.0, seed=3):
+    rnd = random.Random(seed)
+    size = int(100000 * scale)
+    return {
+        "ints": [rnd.randint(-2 ** 15, 2 ** 15) for _ in range(size)],
+        "longs": [rnd.randint(-2 ** 62, 2 ** 62) for _ in range(size)],
+        "floats": [rnd.random() for _ in range(size)],
+        "bools": [rnd.random() < 0.5 for _ in range(size)],
+    }
+
+
+def strings(scale=1.0, seed=4):
+    rnd = random.Random(seed)
+    return [_word(rnd, rnd.choice([4, 16, 64, 256])) for _ in range(int(20000 * scale))]
+
+
+def blobs(scale=1.0, seed=5):
+    rnd = random.Random(seed)
+    return {"blob_%d" % i: rnd.randbytes(4096) for i in range(int(200 * scale))}
+
+
+def records(scale=1.0, seed=6):
+    rnd = random.Random(seed)
+    return [{
+        "id": i,
+        "name": _word(rnd, 10),
+        "email": _word(rnd, 8) + "@example.com",
+        "score": rnd.random() * 100,
+        "active": rnd.random() < 0.8,
+        "tags": [_word(rnd, 5) for _ in range(3)],
+        "position": [rnd.random(), rnd.random(), rnd.random()],
+    } for i in range(int(10000 * scale))]
+
+
+CORPUS = {
+    "wide_map": wide_map,
+    "deep_nesting": deep_nesting,
+    "typed_vectors": typed_vectors,
+    "strings": strings,
+    "blobs": blobs,
+    "records": records,
+}
+
+
+def random_paths(value, count, seed=7):
+    rnd = random.Random(seed)
+    paths = []
+    while len(paths) < count:
+        path = []
+        current = value
+        while isinstance(current, (dict, list)) and current:
+            if isinstance(current, dict):
+                step = rnd.choice(list(current.keys()))
+            else:
+                step = rnd.randrange(len(current))
+            path.append(step)
+            current = current[step]
+            if rnd.random() < 0.1:
+                break
+        paths.append(tuple(path))
+    return paths
+
+
+def _word(rnd, length):
+    return ''.join(rnd.choice(string.ascii_letters) for _ in range(length))
@@ -0,0 +1,153 @@
+import argparse
+import gc
+import json
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+from flexbuffers.flx_builder import FlxBuilder
+from flexbuffers.flx_value import FlxValue
+from .corpus import (CORPUS, random_paths)
+
+
+def operations(value, paths):
+    flx_buffer = FlxBuilder.fromValue(value)
+    try:
+        json_text = json.dumps(value)
+    except TypeError:
+        json_text = None
+    pickle_buffer = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def access():
+        root = FlxValue.from_bytes(flx_buffer)
+        for path in paths:
+            current = root
+            for step in path:
+                current = current[step]
+            current.value()
+
+    result = {
+        "flx_encode": (lambda: FlxBuilder.fromValue(value), len(flx_buffer)),
+        "flx_access": (access, len(flx_buffer)),
+        "flx_to_object": (lambda: FlxValue.from_bytes(flx_buffer).to_object(), len(flx_buffer)),
+        "flx_json": (lambda: FlxValue.from_bytes(flx_buffer).json(), len(flx_buffer)),
+        "pickle_dumps": (lambda: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), len(pickle_buffer)),
+        "pickle_loads": (lambda: pickle.loads(pickle_buffer), len(pickle_buffer)),
+    }
+    if json_text is not None:
+        result["json_dumps"] = (lambda: json.dumps(value), len(json_text))
+        result["json_loads"] = (lambda: json.loads(json_text), len(json_text))
+    return result
+
+
+def measure(function, size, repeat, min_time):
+    function()
+    latencies = []
+    started = time.perf_counter()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(latencies) < repeat or time.perf_counter() - started < min_time:
+            start = time.perf_counter()
+            function()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    return {
+        "runs": len(latencies),
+        "bytes": size,
+        "mean": mean,
+        "p50": _percentile(latencies, 50),
+        "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99),
+        "mb_per_second": size / mean / 1e6 if mean else 0.0,
+        "peak_memory": peak,
+    }
+
+
+def run(names, scale, repeat, min_time, access_count):
+    results = {}
+    for name in names:
+        value = CORPUS[name](scale)
+        paths = random_paths(value, access_count)
+        results[name] = {}
+        for operation, (function, size) in operations(value, paths).items():
+            results[name][operation] = measure(function, size, repeat, min_time)
+            print("%-14s %-14s %s" % (name, operation, _format(results[name][operation])), file=sys.stderr)
+    return {
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "results": results,
+    }
+
+
+def compare(baseline, current, metric, tolerance):
+    regressions = []
+    for name, operations in current["results"].items():
+        for operation, stats in operations.items():
+            previous = baseline["results"].get(name, {}).get(operation)
+            if previous is None or not previous[metric]:
+                continue
+            ratio = stats[metric] / previous[metric]
+            marker = ''
+            # json and pickle are only reported for reference, their noise must not fail the run
+            if operation.startswith("flx_") and ratio > 1 + tolerance:
+                marker = ' REGRESSION'
+                regressions.append((name, operation, ratio))
+            print("%-14s %-14s %s %.3f -> %.3f ms (x%.2f)%s" % (
+                name, operation, metric, previous[metric] * 1000, stats[metric] * 1000, ratio, marker))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="FlexBuffers encode/decode benchmarks")
+    parser.add_argument("--corpus", nargs="*", default=list(CORPUS), choices=list(CORPUS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of every payload")
+    parser.add_argument("--repeat", type=int, default=5, help="minimal number of timed runs per operation")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimal seconds spent per operation")
+    parser.add_argument("--access-count", type=int, default=1000, help="random field reads per access run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--metric", default="p50", choices=["mean", "p50", "p90", "p99"])
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slow down before failing, 0.2 = 20%%")
+    options = parser.parse_args(args)
+
+    current = run(options.corpus, options.scale, options.repeat, options.min_time, options.access_count)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(current, file, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        if baseline.get("scale") != current["scale"]:
+            print("Baseline was recorded with scale %s" % baseline.get("scale"), file=sys.stderr)
+        regressions = compare(baseline, current, options.metric, options.tolerance)
+        if regressions:
+            print("%d regressions" % len(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+def _percentile(values, percent):
+    index = min(len(values) - 1, max(0, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _format(stats):
+    return "p50 %9.3f ms  p99 %9.3f ms  %8.2f MB/s  peak %8.1f KB" % (
+        stats["p50"] * 1000, stats["p99"] * 1000, stats["mb_per_second"], stats["peak_memory"] / 1024)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import asyncio
+import collections.abc
+import functools
+import struct
+from .flx_builder import FlxBuilder
+from .flx_value import FlxValue
+
+_HEADER = struct.Struct('<I')
+
+MAX_FRAME_SIZE = 16 << 20
+
+_ITEM_SIZE = 16
+
+
+async def read_frame(reader, max_frame_size=MAX_FRAME_SIZE):
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise Exception("Stream ended inside of a frame header")
+        return None
+    size = _HEADER.unpack(header)[0]
+    if size > max_frame_size:
+        raise Exception("Frame of %d bytes exceeds max frame size of %d bytes" % (size, max_frame_size))
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise Exception("Stream ended inside of a frame")
+
+
+async def read_value(reader, max_frame_size=MAX_FRAME_SIZE, key_cache=False, checked=True):
+    frame = await read_frame(reader, max_frame_size)
+    if frame is None:
+        return None
+    return FlxValue.from_bytes(frame, key_cache, checked)
+
+
+async def iter_values(reader, max_frame_size=MAX_FRAME_SIZE, key_cache=False, checked=True):
+    while True:
+        value = await read_value(reader, max_frame_size, key_cache, checked)
+        if value is None:
+            return
+        yield value
+
+
+def write_frames(writer, buffers):
+    chunks = []
+    for buffer in buffers:
+        chunks.append(_HEADER.pack(len(buffer)))
+        chunks.append(buffer)
+    writer.writelines(chunks)
+
+
+async def encode(value, executor=None, offload_size=1 << 16, offload=None, **options):
+    if offload is None:
+        offload = offload_size is not None and _approximate_size(value) >= offload_size
+    if not offload:
+        return FlxBuilder.fromValue(value, **options)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(FlxBuilder.fromValue, value, **options))
+
+
+# only looks at the top level, walking the whole value would block the loop as long as encoding it
+def _approximate_size(value):
+    if isinstance(value, str):
+        return len(value)
+    try:
+        with memoryview(value) as view:
+            return view.nbytes
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, collections.abc.Sized):
+        return len(value) * _ITEM_SIZE
+    return 0
+
+
+class FlxStream:
+    __slots__ = ('reader', 'writer', 'max_frame_size', 'key_cache', 'checked', 'executor', 'offload_size', '_options')
+
+    def __init__(self, reader, writer, max_frame_size=MAX_FRAME_SIZE, key_cache=False, checked=True,
+                 executor=None, offload_size=1 << 16, **options):
+        self.reader = reader
+        self.writer = writer
+        self.max_frame_size = max_frame_size
+        self.key_cache = key_cache
+        self.checked = checked
+        self.executor = executor
+        self.offload_size = offload_size
+        self._options = options
+
+    async def recv(self):
+        return await read_value(self.reader, self.max_frame_size, self.key_cache, self.checked)
+
+    def __aiter__(self):
+        return iter_values(self.reader, self.max_frame_size, self.key_cache, self.checked)
+
+    async def send(self, value, offload=None):
+        await self.send_many((value,), offload)
+
+    async def send_many(self, values, offload=None):
+        buffers = [await encode(value, self.executor, self.offload_size, offload, **self._options) for value in values]
+        await self.send_buffers(buffers)
+
+    async def send_buffers(self, buffers):
+        for buffer in buffers:
+            if len(buffer) > self.max_frame_size:
+                raise Exception("Frame of %d bytes exceeds max frame size of %d bytes" % (
+                    len(buffer), self.max_frame_size))
+        write_frames(self.writer, buffers)
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def open_connection(host=None, port=None, max_frame_size=MAX_FRAME_SIZE, key_cache=False, checked=True,
+                          executor=None, offload_size=1 << 16, **options):
+    reader, writer = await asyncio.open_connection(host, port)
+    return FlxStream(reader, writer, max_frame_size, key_cache, checked, executor, offload_size, **options)
@@ -0,0 +1,106 @@
+import array
+import asyncio
+import concurrent.futures
+import struct
+import unittest
+from . import flx_asyncio
+from .flx_asyncio import (FlxStream, open_connection, read_value, write_frames)
+from .flx_builder import FlxBuilder
+
+
+class MyTestCase(unittest.TestCase):
+    records = [{"id": i, "name": "name %d" % i, "values": list(range(i))} for i in range(20)]
+
+    def serve(self, handler, client):
+        async def main():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            try:
+                return await client(server.sockets[0].getsockname()[1])
+            finally:
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(main())
+
+    def test_round_trip(self):
+        async def echo(reader, writer):
+            stream = FlxStream(reader, writer)
+            async for value in stream:
+                await stream.send(value.to_object())
+            await stream.close()
+
+        async def client(port):
+            stream = await open_connection("127.0.0.1", port, offload_size=100)
+            await stream.send_many(self.records)
+            await stream.send("end")
+            result = [(await stream.recv()).to_object() for _ in range(len(self.records))]
+            last = await stream.recv()
+            self.assertIsInstance(last._buffer, bytes)
+            result.append(last.value())
+            stream.writer.write_eof()
+            self.assertIsNone(await stream.recv())
+            await stream.close()
+            return result
+
+        self.assertEqual(self.serve(echo, client), self.records + ["end"])
+
+    def test_max_frame_size(self):
+        buffer = FlxBuilder.fromValue(list(range(100)))
+
+        async def handler(reader, writer):
+            try:
+                await read_value(reader, max_frame_size=64)
+            except Exception as e:
+                writer.write(str(e).encode())
+            writer.close()
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            write_frames(writer, [buffer])
+            await writer.drain()
+            message = await reader.read()
+            writer.close()
+            return message
+
+        self.assertEqual(self.serve(handler, client),
+                         b"Frame of %d bytes exceeds max frame size of 64 bytes" % len(buffer))
+
+    def test_truncated_frame(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(struct.pack('<I', 10) + b'abc')
+            reader.feed_eof()
+            with self.assertRaises(Exception):
+                await flx_asyncio.read_frame(reader)
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'ab')
+            reader.feed_eof()
+            with self.assertRaises(Exception):
+                await flx_asyncio.read_frame(reader)
+
+        asyncio.run(run())
+
+    def test_encode_in_executor(self):
+        class Executor(concurrent.futures.ThreadPoolExecutor):
+            submitted = 0
+
+            def submit(self, *args, **kwargs):
+                Executor.submitted += 1
+                return super().submit(*args, **kwargs)
+
+        async def run(value, **options):
+            with Executor(1) as executor:
+                return await flx_asyncio.encode(value, executor, **options)
+
+        value = list(range(1000))
+        self.assertEqual(asyncio.run(run(value, offload_size=10)), FlxBuilder.fromValue(value))
+        self.assertEqual(Executor.submitted, 1)
+        asyncio.run(run(value))
+        asyncio.run(run("x" * 100, offload_size=10, offload=False))
+        self.assertEqual(Executor.submitted, 1)
+        asyncio.run(run(b"x", offload=True))
+        asyncio.run(run(array.array('d', range(10000))))
+        self.assertEqual(Executor.submitted, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
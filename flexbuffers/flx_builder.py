@@ -1,107 +1,382 @@
+import array
 import collections
+import collections.abc
+import contextlib
+import dataclasses
+import operator
 import struct
+import sys
+import threading
 from .value_types import (ValueType, BitWidth)
 
 
-class _StackValue:
-    def __init__(self, value):
-        self._value = value
-        if value is None:
-            self._type = ValueType.Null
-            self._width = BitWidth.Width8
-        elif isinstance(value, bool):
-            self._type = ValueType.Bool
-            self._width = BitWidth.Width8
-        elif isinstance(value, int):
-            self._type = ValueType.Int
-            self._width = BitWidth.width(value)
-        elif isinstance(value, float):
-            self._type = ValueType.Float
-            self._width = BitWidth.width(value)
-        else:
-            raise Exception("Unexpected value type")
+_BIT_WIDTHS = tuple(BitWidth)
+_INLINE_TYPES = frozenset(t for t in ValueType if t.is_inline())
+_TYPED_ELEMENT_TYPES = frozenset(t for t in ValueType if t.is_typed_vector_element())
+_NUMBER_TYPES = frozenset(t for t in ValueType if t.is_number())
 
-    @staticmethod
-    def valueWithType(value, value_type: ValueType, width: BitWidth):
-        result = _StackValue(value)
-        result._width = width
-        result._type = value_type
-        return result
+_SCALAR_TYPES = frozenset([type(None), bool, int, float])
 
-    def stored_width(self, bit_width=BitWidth.Width8):
-        if self._type.is_inline():
-            return BitWidth(max(self._width, bit_width))
-        return self._width
+_PADDING = tuple(bytes(i) for i in range(8))
 
-    def stored_packed_type(self, bit_width=BitWidth.Width8):
-        return ValueType.packed_type(self._type, self.stored_width(bit_width))
+_INT_PACKERS = {1: struct.Struct("<b").pack_into, 2: struct.Struct("<h").pack_into,
+                4: struct.Struct("<i").pack_into, 8: struct.Struct("<q").pack_into}
+_UINT_PACKERS = {1: struct.Struct("<B").pack_into, 2: struct.Struct("<H").pack_into,
+                 4: struct.Struct("<I").pack_into, 8: struct.Struct("<Q").pack_into}
+_FLOAT_PACKERS = {4: struct.Struct("<f").pack_into, 8: struct.Struct("<d").pack_into}
 
-    def element_width(self, size, index):
-        if self._type.is_inline():
-            return self._width
-        for i in range(4):
-            width = 1 << i
-            offset_loc = size + BitWidth.padding_size(size, width) + index * width
-            offset = offset_loc - self._value
-            bit_width = BitWidth.width(offset)
-            if 1 << bit_width == width:
-                return bit_width
-        raise Exception("Element is of unknown width")
 
-    def value(self):
-        return self._value
+_VECTOR_TYPES = {
+    'b': ValueType.VectorInt, 'h': ValueType.VectorInt, 'i': ValueType.VectorInt,
+    'l': ValueType.VectorInt, 'q': ValueType.VectorInt,
+    'B': ValueType.VectorUInt, 'H': ValueType.VectorUInt, 'I': ValueType.VectorUInt,
+    'L': ValueType.VectorUInt, 'Q': ValueType.VectorUInt,
+    'f': ValueType.VectorFloat, 'd': ValueType.VectorFloat,
+    '?': ValueType.VectorBool,
+}
 
-    def type(self):
-        return self._type
+_LITTLE_ENDIAN = sys.byteorder == 'little'
 
-    def width(self):
-        return self._width
 
-    def is_offset(self):
-        return not self._type.is_inline()
+def _vector_type(fmt):
+    if len(fmt) > 2 or (len(fmt) == 2 and fmt[0] not in '@=<>!'):
+        return None
+    return _VECTOR_TYPES.get(fmt[-1])
 
-    def is_f32(self):
-        return self._type == ValueType.Float and self._width == BitWidth.Width32
 
+def _rows(value, view):
+    if not isinstance(value, memoryview):
+        return [value[i] for i in range(view.shape[0])]
+    # memoryview does not support indexing of single rows
+    fmt = view.format
+    if len(fmt) > 1 and fmt[0] != '@':
+        raise Exception("Unexpected vector format " + fmt)
+    if view.nbytes == 0:
+        return [memoryview(b'').cast(fmt[-1])] * view.shape[0]
+    data = view.cast('B') if view.c_contiguous else memoryview(view.tobytes())
+    row_shape = view.shape[1:]
+    row_size = view.nbytes // view.shape[0]
+    return [data[i * row_size:(i + 1) * row_size].cast(fmt[-1], row_shape) for i in range(view.shape[0])]
 
-class _KeysHash:
-    def __init__(self, keys):
-        self.keys = keys
 
-    def __eq__(self, o: object) -> bool:
-        return (
-            self.__class__ == o.__class__ and
-            self.keys == o.keys
-        )
+def _typed_vector_size(view):
+    count = view.nbytes // view.itemsize
+    row_length = view.shape[-1] if view.ndim else 1
+    rows = count // row_length if row_length else 0
+    # short elements are widened when the row length does not fit into them
+    return 16 * (rows + 1) + count * max(view.itemsize, 1 << _width(row_length))
 
-    def __hash__(self) -> int:
-        result = 17
-        for key in self.keys:
-            result = result * 23 + key
-        return result
+
+def _buffer_vector_type(value):
+    try:
+        view = value if isinstance(value, memoryview) else memoryview(value)
+    except (TypeError, ValueError):
+        return None
+    return _vector_type(view.format)
+
+
+def _array_codes(codes):
+    result = {}
+    for code in codes:
+        result.setdefault(array.array(code).itemsize, code)
+    return result
+
+
+_ARRAY_CODES = {
+    ValueType.VectorInt: _array_codes('bhilq'),
+    ValueType.VectorUInt: _array_codes('BHILQ'),
+    ValueType.VectorFloat: _array_codes('fd'),
+    ValueType.VectorBool: _array_codes('BHILQ'),
+}
+
+
+class _Container:
+    __slots__ = ('start', 'is_map', 'keys', 'sorted')
+
+    def __init__(self, start, is_map):
+        self.start = start
+        self.is_map = is_map
+        self.keys = [] if is_map else None
+        self.sorted = True
+
+
+class DedupCache:
+    __slots__ = ('max_entries', 'hits', 'misses', '_entries')
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {} if max_entries is None else collections.OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.max_entries is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _dedup_cache(option):
+    if option is True:
+        return DedupCache()
+    if not option:
+        return None
+    if isinstance(option, int) and option > 0:
+        return DedupCache(option)
+    raise Exception("Cache option needs to be a bool or a positive number of entries")
 
 
 class FlxBuilder:
-    def __init__(self, size=2048):
+    def __init__(self, size=2048, string_cache=True, key_cache=True, key_vector_cache=True,
+                 max_cached_string_length=None):
         self._buffer = bytearray(size)
-        self._stack = []
+        self._stack_values = []
+        self._stack_types = []
+        self._stack_widths = []
         self._offset = 0
+        # offsets on the stack and in the caches are absolute, _flushed is the position of the buffer start
+        self._flushed = 0
         self._finished = False
-        self._string_cache = {}
-        self._key_cache = {}
-        self._key_vector_cache = {}
+        self._string_cache = _dedup_cache(string_cache)
+        self._key_cache = _dedup_cache(key_cache)
+        self._key_vector_cache = _dedup_cache(key_vector_cache)
+        self._max_cached_string_length = max_cached_string_length
+        self._containers = []
+        self._shape_keys = {}
 
     @staticmethod
-    def fromValue(value):
-        fbb = FlxBuilder()
+    def fromValue(value, size=2048, estimate=False, **options):
+        fbb = FlxBuilder(FlxBuilder.estimateSize(value) if estimate else size, **options)
         fbb._addDynamic(value)
         return fbb._finish()
 
+    @staticmethod
+    def registerClass(cls, include=None, exclude=None):
+        layout = _ClassLayout.create(cls, include, exclude)
+        if layout is None:
+            raise Exception("Only dataclasses, NamedTuples and classes with __slots__ can be registered")
+        _CLASS_LAYOUTS[cls] = layout
+
+    @staticmethod
+    def estimateSize(value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return 9
+        if isinstance(value, (bytes, str)):
+            return len(value) + 18
+        if isinstance(value, (array.array, memoryview)) or getattr(value, 'ndim', 0) > 0:
+            if _buffer_vector_type(value) is not None:
+                return _typed_vector_size(memoryview(value))
+        if isinstance(value, collections.abc.Mapping):
+            size = 32
+            for k, v in value.items():
+                size += len(k) + 18 + FlxBuilder.estimateSize(v)
+            return size
+        layout = _class_layout(type(value))
+        if layout:
+            return FlxBuilder.estimateSize(layout.mapping(value))
+        if getattr(value, '__dict__', None) is not None:
+            return FlxBuilder.estimateSize(vars(value))
+        if isinstance(value, collections.abc.Collection):
+            # one shot iterables like generators are not consumed by the estimation
+            size = 16
+            for v in value:
+                size += FlxBuilder.estimateSize(v)
+            return size
+        return 9
+
+    def startMap(self):
+        self._checkValue()
+        self._containers.append(_Container(self._startVector(), True))
+
+    def endMap(self):
+        container = self._endContainer(True)
+        if not container.sorted:
+            self._sortMap(container)
+        self._endMap(container.start)
+
+    def startVector(self):
+        self._checkValue()
+        self._containers.append(_Container(self._startVector(), False))
+
+    def endVector(self):
+        container = self._endContainer(False)
+        self._endVector(container.start)
+
+    def addKey(self, key: str):
+        if self._finished:
+            raise Exception("FlexBuffer is already finished")
+        if not self._containers or not self._containers[-1].is_map:
+            raise Exception("Keys can only be added to a map")
+        container = self._containers[-1]
+        if (len(self._stack_types) - container.start) & 1:
+            raise Exception("Expected a value after key")
+        if container.keys and container.keys[-1] >= key:
+            if container.keys[-1] == key:
+                raise Exception("Duplicate key " + key)
+            container.sorted = False
+        container.keys.append(key)
+        self._addKey(key)
+
+    def add(self, value):
+        self._checkValue()
+        self._addDynamic(value)
+
+    def addNull(self):
+        self._checkValue()
+        self._add(None)
+
+    def addBool(self, value: bool):
+        self._checkValue()
+        self._add(bool(value))
+
+    def addInt(self, value: int):
+        self._checkValue()
+        self._add(int(value))
+
+    def addFloat(self, value: float):
+        self._checkValue()
+        self._add(float(value))
+
+    def addString(self, value: str):
+        self._checkValue()
+        self._addString(value)
+
+    def addBlob(self, value: bytes):
+        self._checkValue()
+        self._addBlob(value)
+
+    def addTypedVector(self, value, narrow=False):
+        self._checkValue()
+        self._addTypedVector(value, narrow)
+
+    def addShaped(self, shape, record):
+        self._checkValue()
+        self._addShapedMapping(shape, record)
+
+    def finish(self):
+        if self._containers:
+            raise Exception("Not all vectors and maps are ended")
+        return self._finish()
+
+    def finishView(self):
+        if self._containers:
+            raise Exception("Not all vectors and maps are ended")
+        if not self._finished:
+            self._finish_buffer()
+        with memoryview(self._buffer) as view:
+            return view[:self._offset].toreadonly()
+
+    def finishInto(self, target, offset=0):
+        if self._containers:
+            raise Exception("Not all vectors and maps are ended")
+        if not self._finished:
+            self._finish_buffer()
+        size = self._offset
+        with memoryview(target) as view:
+            if view.readonly:
+                raise Exception("Target buffer is read only")
+            if offset < 0 or view.nbytes < offset + size:
+                raise Exception("Target buffer is too small")
+            with memoryview(self._buffer) as source, view.cast('B') as target_bytes:
+                target_bytes[offset:offset + size] = source[:size]
+        return size
+
+    def cacheStats(self):
+        result = {}
+        for name, cache in (("string", self._string_cache), ("key", self._key_cache),
+                            ("key_vector", self._key_vector_cache)):
+            if cache is not None:
+                result[name] = {"hits": cache.hits, "misses": cache.misses,
+                                "hit_rate": cache.hit_rate(), "entries": len(cache)}
+        return result
+
+    def reset(self, max_size=None):
+        # a view returned by finishView would see the next FlexBuffer, resizing is refused while it is alive
+        try:
+            self._buffer.append(0)
+        except BufferError:
+            raise Exception("View returned by finishView needs to be released before reset")
+        del self._buffer[-1]
+        if max_size is not None and len(self._buffer) > max_size:
+            del self._buffer[max_size:]
+        self._stack_values.clear()
+        self._stack_types.clear()
+        self._stack_widths.clear()
+        self._containers.clear()
+        self._shape_keys.clear()
+        self._offset = 0
+        self._flushed = 0
+        self._finished = False
+        # cached offsets point into the previous FlexBuffer, only the configured caches and their stats are kept
+        for cache in (self._string_cache, self._key_cache, self._key_vector_cache):
+            if cache is not None:
+                cache.clear()
+
+    def _checkValue(self):
+        if self._finished:
+            raise Exception("FlexBuffer is already finished")
+        if self._containers:
+            container = self._containers[-1]
+            if container.is_map and not (len(self._stack_types) - container.start) & 1:
+                raise Exception("Expected a key before value in map")
+        elif self._stack_types:
+            raise Exception("Only one root value can be added")
+
+    def _endContainer(self, is_map):
+        if not self._containers or self._containers[-1].is_map != is_map:
+            raise Exception("No open " + ("map" if is_map else "vector") + " to end")
+        if is_map and (len(self._stack_types) - self._containers[-1].start) & 1:
+            raise Exception("Map has a key without a value")
+        return self._containers.pop()
+
+    def _sortMap(self, container):
+        start = container.start
+        pairs = sorted(zip(container.keys, range(start, len(self._stack_types), 2)))
+        for i in range(1, len(pairs)):
+            if pairs[i - 1][0] == pairs[i][0]:
+                raise Exception("Duplicate key " + pairs[i][0])
+        for column in (self._stack_values, self._stack_types, self._stack_widths):
+            column[start:] = [column[j] for _, i in pairs for j in (i, i + 1)]
+
     def _addDynamic(self, value):
+        value_type = type(value)
+        if value_type in _SCALAR_TYPES:
+            return self._add(value)
+        layout = _CLASS_LAYOUTS.get(value_type)
+        if layout is None:
+            layout = _class_layout(value_type)
+        if layout:
+            try:
+                values = layout.values(value)
+            except AttributeError:
+                return self._addDynamic(layout.mapping(value))
+            return self._addShaped(layout.shape, values)
         if isinstance(value, bytes):
             self._addBlob(value)
             return ValueType.Blob
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, (array.array, memoryview)) or getattr(value, 'ndim', 0) > 0:
+            if _buffer_vector_type(value) is not None:
+                return self._addTypedVector(value)
+        if isinstance(value, collections.abc.Mapping):
             start = self._startVector()
             keys = sorted(value.keys())
             for k in keys:
@@ -113,7 +388,7 @@ class FlxBuilder:
             return self._addDynamic(vars(value))
         if isinstance(value, str):
             return self._addString(value)
-        if isinstance(value, collections.Iterable):
+        if isinstance(value, collections.abc.Iterable):
             start = self._startVector()
             for v in value:
                 self._addDynamic(v)
@@ -123,95 +398,259 @@ class FlxBuilder:
             self._add(value)
 
     def _add(self, value):
-        stack_value = _StackValue(value)
-        self._stack.append(stack_value)
-        return stack_value.type()
+        if value is None:
+            value_type, width = ValueType.Null, BitWidth.Width8
+        elif isinstance(value, bool):
+            value_type, width = ValueType.Bool, BitWidth.Width8
+        elif isinstance(value, int):
+            value_type, width = ValueType.Int, _width(value)
+        elif isinstance(value, float):
+            value_type, width = ValueType.Float, BitWidth.Width64
+        else:
+            raise Exception("Unexpected value type")
+        self._stack_values.append(value)
+        self._stack_types.append(value_type)
+        self._stack_widths.append(width)
+        return value_type
+
+    def _push(self, value, value_type, width):
+        self._stack_values.append(value)
+        self._stack_types.append(value_type)
+        self._stack_widths.append(width)
 
     def _addString(self, value):
         utf8 = bytes(value, 'utf-8')
         length = len(utf8)
-        bit_width = BitWidth.width(length)
-        if value in self._string_cache:
-            self._stack.append(_StackValue.valueWithType(self._string_cache[value], ValueType.String, bit_width))
-            return
+        bit_width = _width(length)
+        cache = self._string_cache
+        if cache is not None and (self._max_cached_string_length is None or
+                                  length <= self._max_cached_string_length):
+            string_offset = cache.get(value)
+            if string_offset is not None:
+                self._push(string_offset, ValueType.String, bit_width)
+                return ValueType.String
+        else:
+            cache = None
         byte_width = self._align(bit_width)
         self._writeValue(length, byte_width)
         string_offset = self._offset
         new_offset = self._newOffset(length + 1)
         self._buffer[self._offset:self._offset + length] = utf8
+        self._buffer[self._offset + length] = 0
         self._offset = new_offset
-        self._stack.append(_StackValue.valueWithType(string_offset, ValueType.String, bit_width))
-        self._string_cache[value] = string_offset
+        string_offset += self._flushed
+        self._push(string_offset, ValueType.String, bit_width)
+        if cache is not None:
+            cache.put(value, string_offset)
         return ValueType.String
 
     def _addKey(self, value):
-        if value in self._key_cache:
-            self._stack.append(_StackValue.valueWithType(self._key_cache[value], ValueType.Key, BitWidth.Width8))
-            return
+        cache = self._key_cache
+        if cache is not None:
+            key_offset = cache.get(value)
+            if key_offset is not None:
+                self._push(key_offset, ValueType.Key, BitWidth.Width8)
+                return
         utf8 = bytes(value, 'utf-8')
         length = len(utf8)
-        key_offset = self._offset
+        key_offset = self._offset + self._flushed
         new_offset = self._newOffset(length + 1)
         self._buffer[self._offset:self._offset + length] = utf8
+        self._buffer[self._offset + length] = 0
         self._offset = new_offset
-        self._stack.append(_StackValue.valueWithType(key_offset, ValueType.Key, BitWidth.Width8))
-        self._key_cache[value] = key_offset
+        self._push(key_offset, ValueType.Key, BitWidth.Width8)
+        if cache is not None:
+            cache.put(value, key_offset)
 
     def _addBlob(self, value: bytes):
         length = len(value)
-        bit_width = BitWidth.width(length)
+        bit_width = _width(length)
         byte_width = self._align(bit_width)
         self._writeValue(length, byte_width)
         new_offset = self._newOffset(length)
         blob_offset = self._offset
         self._buffer[self._offset:self._offset + length] = value
         self._offset = new_offset
-        self._stack.append(_StackValue.valueWithType(blob_offset, ValueType.Blob, bit_width))
+        self._push(blob_offset + self._flushed, ValueType.Blob, bit_width)
+
+    def _addTypedVector(self, value, narrow=False):
+        view = value if isinstance(value, memoryview) else memoryview(value)
+        fmt = view.format
+        code = fmt[-1]
+        vector_type = _vector_type(fmt)
+        if vector_type is None:
+            raise Exception("Unexpected vector format " + fmt)
+        if view.ndim > 1:
+            # every row becomes a typed vector of its own, so the shape survives the round trip
+            start = self._startVector()
+            for row in _rows(value, view):
+                self._addTypedVector(row, narrow)
+            self._endVector(start)
+            return ValueType.Vector
+        item_size = view.itemsize
+        codes = _ARRAY_CODES[vector_type]
+        little = _LITTLE_ENDIAN if fmt[0] in '@=' or fmt == code else fmt[0] == '<'
+        if (fmt == code or fmt[0] == '@') and view.c_contiguous:
+            data = view if view.ndim == 1 else view.cast('B').cast(code)
+        else:
+            data = array.array(codes[item_size], view.tobytes())
+            if little != _LITTLE_ENDIAN:
+                data.byteswap()
+        length = len(data)
+        bit_width = BitWidth(item_size.bit_length() - 1)
+        if narrow and length > 0:
+            bit_width = _narrow_width(vector_type, data, bit_width)
+        bit_width = max(bit_width, _width(length))
+        if vector_type == ValueType.VectorFloat and bit_width < BitWidth.Width32:
+            bit_width = BitWidth.Width32
+        byte_width = 1 << bit_width
+        if byte_width != item_size:
+            data = array.array(codes[byte_width], data)
+        if not _LITTLE_ENDIAN:
+            data = array.array(codes[byte_width], data)
+            data.byteswap()
+        byte_width = self._align(bit_width)
+        self._writeValue(length, byte_width)
+        vec_offset = self._offset
+        new_offset = self._newOffset(length * byte_width)
+        self._buffer[vec_offset:new_offset] = data
+        self._offset = new_offset
+        self._push(vec_offset + self._flushed, vector_type, bit_width)
+        return vector_type
 
     def _startVector(self):
-        return len(self._stack)
+        return len(self._stack_types)
 
     def _endVector(self, start):
-        vec_len = len(self._stack) - start
+        vec_len = len(self._stack_types) - start
         vec = self._createVector(start, vec_len, 1)
-        del self._stack[start:]
-        self._stack.append(vec)
-        return vec.value()
+        self._replaceStack(start, vec)
+        return vec[0]
 
     def _endMap(self, start):
-        vec_len = (len(self._stack) - start) >> 1
-        offsets = []
-        for i in range(start, len(self._stack), 2):
-            offsets.append(self._stack[i].value())
-        keys_hash = _KeysHash(offsets)
-        keys = self._key_vector_cache[keys_hash] \
-            if keys_hash in self._key_vector_cache \
-            else self._createVector(start, vec_len, 2)
-        self._key_vector_cache[keys_hash] = keys
+        vec_len = (len(self._stack_types) - start) >> 1
+        cache = self._key_vector_cache
+        if cache is None:
+            keys = self._createVector(start, vec_len, 2)
+        else:
+            keys_hash = tuple(self._stack_values[start::2])
+            keys = cache.get(keys_hash)
+            if keys is None:
+                keys = self._createVector(start, vec_len, 2)
+                cache.put(keys_hash, keys)
         vec = self._createVector(start + 1, vec_len, 2, keys)
-        del self._stack[start:]
-        self._stack.append(vec)
+        self._replaceStack(start, vec)
+        return keys
+
+    def _addShaped(self, shape, values):
+        adders = shape._adders
+        start = len(self._stack_types)
+        keys = self._shape_keys.get(shape)
+        if keys is None:
+            for key, value, (value_type, adder) in zip(shape.keys, values, adders):
+                self._addKey(key)
+                if type(value) is value_type:
+                    adder(self, value)
+                else:
+                    self._addDynamic(value)
+            self._shape_keys[shape] = self._endMap(start)
+            return ValueType.Map
+        if shape._scalar_types is not None and self._addScalarShaped(shape, values, keys):
+            return ValueType.Map
+        for value, (value_type, adder) in zip(values, adders):
+            if type(value) is value_type:
+                adder(self, value)
+            else:
+                self._addDynamic(value)
+        self._replaceStack(start, self._createVector(start, len(adders), 1, keys))
+        return ValueType.Map
+
+    # maps of inline scalars are written in one go, the layout only depends on the widest value
+    def _addScalarShaped(self, shape, values, keys):
+        types = shape._scalar_types
+        if tuple(map(type, values)) != types:
+            return False
+        vec_len = len(types)
+        type_bytes = bytearray(shape._type_bytes)
+        bit_width = shape._min_width
+        for i in shape._int_indexes:
+            value = values[i]
+            if not -128 < value < 128:
+                width = _width(value)
+                type_bytes[i] |= width
+                if width > bit_width:
+                    bit_width = width
+        base = self._flushed
+        if bit_width < BitWidth.Width64:
+            elem_width = _offset_width(keys[0], self._offset + base, 0)
+            if elem_width > bit_width:
+                bit_width = elem_width
+        byte_width = self._align(bit_width)
+        pack = shape._packers.get(byte_width)
+        if pack is None:
+            # keys vector offset, keys byte width and length, followed by the values
+            pack = shape._packers[byte_width] = struct.Struct(
+                '<' + _UINT_FORMATS[byte_width] * 3 + ''.join(_SHAPE_FORMATS[t][byte_width] for t in types)).pack_into
+        prefix_offset = self._offset
+        vec_offset = prefix_offset + 3 * byte_width
+        types_offset = vec_offset + vec_len * byte_width
+        end = self._newOffset(3 * byte_width + vec_len * byte_width + vec_len)
+        rel_offset = prefix_offset + base - keys[0]
+        if byte_width != 8 and rel_offset >= 1 << (byte_width * 8):
+            raise Exception("Unexpected size")
+        buffer = self._buffer
+        try:
+            pack(buffer, prefix_offset, rel_offset, 1 << keys[2], vec_len, *values)
+        except struct.error:
+            # unsigned 64 bit values do not fit into the signed format
+            return False
+        buffer[types_offset:end] = type_bytes
+        self._offset = end
+        self._push(vec_offset + base, ValueType.Map, bit_width)
+        return True
+
+    def _addShapedMapping(self, shape, record):
+        if len(record) != len(shape.keys):
+            return self._addDynamic(record)
+        try:
+            values = [record[key] for key in shape.keys]
+        except KeyError:
+            return self._addDynamic(record)
+        return self._addShaped(shape, values)
+
+    def _replaceStack(self, start, entry):
+        del self._stack_values[start:]
+        del self._stack_types[start:]
+        del self._stack_widths[start:]
+        self._push(*entry)
 
     def _finish(self):
         if not self._finished:
             self._finish_buffer()
-        return bytes(self._buffer[:self._offset])
+        with memoryview(self._buffer) as view:
+            return bytes(view[:self._offset])
 
     def _finish_buffer(self):
         if self._finished:
             raise Exception("FlexBuffer is already finished")
-        if len(self._stack) != 1:
+        if len(self._stack_types) != 1:
             raise Exception("Stack needs to be exactly 1")
-        value: _StackValue = self._stack[0]
-        byte_width = self._align(value.element_width(self._offset, 0))
-        self._writeStackValue(value, byte_width)
-        self._writeValue(value.stored_packed_type(), 1)
+        value, value_type, width = self._stack_values[0], self._stack_types[0], self._stack_widths[0]
+        elem_width = width if value_type in _INLINE_TYPES else _offset_width(value, self._offset + self._flushed, 0)
+        byte_width = self._align(elem_width)
+        self._writeEntry(value, value_type, byte_width)
+        self._writeValue(value_type << 2 | width, 1)
         self._writeValue(byte_width, 1)
         self._finished = True
 
     def _align(self, width):
         byte_width = 1 << width
-        self._offset += BitWidth.padding_size(self._offset, byte_width)
+        padding = BitWidth.padding_size(self._offset, byte_width)
+        if padding:
+            # a reused buffer still holds bytes of the previous FlexBuffer, so padding is written explicitly
+            new_offset = self._newOffset(padding)
+            self._buffer[self._offset:new_offset] = _PADDING[padding]
+            self._offset = new_offset
         return byte_width
 
     def _writeValue(self, value, width):
@@ -219,89 +658,396 @@ class FlxBuilder:
         _pack(self._buffer, value, width, self._offset)
         self._offset = new_offset
 
-    def _writeStackValue(self, stack_value: _StackValue, width):
-        new_offset = self._newOffset(width)
-        if stack_value.is_offset():
-            rel_offset = self._offset - stack_value.value()
-            if width == 8 or rel_offset < (1 << (width * 8)):
-                self._writeValue(rel_offset, width)
-            else:
-                raise Exception("Unexpected size")
-        else:
-            _pack(self._buffer, stack_value.value(), width, self._offset)
-        self._offset = new_offset
+    def _writeEntry(self, value, value_type, width):
+        if value_type in _INLINE_TYPES:
+            self._writeValue(value, width)
+            return
+        rel_offset = self._offset + self._flushed - value
+        if width != 8 and rel_offset >= 1 << (width * 8):
+            raise Exception("Unexpected size")
+        self._writeValue(rel_offset, width)
 
     def _newOffset(self, width):
         new_offset = self._offset + width
-        size = len(self._buffer)
-        prev_size = size
-        while size < new_offset:
-            size <<= 1
-        if prev_size < size:
-            buffer = bytearray(size)
-            buffer[0:len(self._buffer)] = self._buffer
-            self._buffer = buffer
+        if new_offset > len(self._buffer):
+            self._grow(new_offset)
         return new_offset
 
-    def _createVector(self, start, vec_len, step, keys: _StackValue = None):
-        bit_width = BitWidth.width(vec_len)
+    def _grow(self, min_size):
+        size = len(self._buffer) or 1
+        while size < min_size:
+            size <<= 1
+        # extending lets the allocator resize the buffer in place instead of allocating a new one and copying
+        self._buffer.extend(bytes(size - len(self._buffer)))
+
+    def _createVector(self, start, vec_len, step, keys=None):
+        values, types, widths = self._stack_values, self._stack_types, self._stack_widths
+        end = start + vec_len * step
+        base = self._flushed
+        offset = self._offset + base
+        bit_width = _width(vec_len)
         prefix_elements = 1
         if keys is not None:
-            elem_width = keys.element_width(self._offset, 0)
+            elem_width = _offset_width(keys[0], offset, 0)
             if elem_width > bit_width:
                 bit_width = elem_width
             prefix_elements += 2
-        vector_type = ValueType.Key
-        typed = keys is None
-        for i in range(start, len(self._stack), step):
-            elem_width = self._stack[i].element_width(self._offset, i + prefix_elements)
+        index = prefix_elements
+        for i in range(start, end, step):
+            if types[i] in _INLINE_TYPES:
+                elem_width = widths[i]
+            elif offset + index - values[i] < 128:
+                elem_width = BitWidth.Width8
+            else:
+                elem_width = _offset_width(values[i], offset, index)
             if elem_width > bit_width:
                 bit_width = elem_width
-            if i == start:
-                vector_type = self._stack[i].type()
-                typed &= vector_type.is_typed_vector_element()
-            else:
-                if vector_type != self._stack[i].type():
-                    typed = False
+                if bit_width == BitWidth.Width64:
+                    break
+            index += 1
+        if vec_len == 0:
+            vector_type = ValueType.Key
+            typed = keys is None
+        else:
+            vector_type = types[start]
+            typed = keys is None and vector_type in _TYPED_ELEMENT_TYPES \
+                and types[start:end:step].count(vector_type) == vec_len
         byte_width = self._align(bit_width)
-        fix = typed and 2 <= vec_len <= 4 and vector_type.is_number()
+        fix = typed and 2 <= vec_len <= 4 and vector_type in _NUMBER_TYPES
+        int_pack = _INT_PACKERS[byte_width]
+        uint_pack = _UINT_PACKERS[byte_width]
+        max_offset = 1 << (byte_width * 8)
+        prefix_offset = self._offset
+        prefix_size = (prefix_elements if not fix else prefix_elements - 1) * byte_width
+        self._offset = self._newOffset(prefix_size + vec_len * byte_width)
+        buffer = self._buffer
         if keys is not None:
-            self._writeStackValue(keys, byte_width)
-            self._writeValue(1 << keys.width(), byte_width)
+            rel_offset = prefix_offset + base - keys[0]
+            if byte_width != 8 and rel_offset >= max_offset:
+                raise Exception("Unexpected size")
+            uint_pack(buffer, prefix_offset, rel_offset)
+            uint_pack(buffer, prefix_offset + byte_width, 1 << keys[2])
         if not fix:
-            self._writeValue(vec_len, byte_width)
-        vec_offset = self._offset
-        for i in range(start, len(self._stack), step):
-            self._writeStackValue(self._stack[i], byte_width)
+            uint_pack(buffer, prefix_offset + prefix_size - byte_width, vec_len)
+        vec_offset = prefix_offset + prefix_size
+        pos = vec_offset
+        for i in range(start, end, step):
+            value = values[i]
+            value_type = types[i]
+            if value_type not in _INLINE_TYPES:
+                rel_offset = pos + base - value
+                if byte_width != 8 and rel_offset >= max_offset:
+                    raise Exception("Unexpected size")
+                uint_pack(buffer, pos, rel_offset)
+            elif value_type == ValueType.Float:
+                _FLOAT_PACKERS[byte_width](buffer, pos, value)
+            elif value is None:
+                uint_pack(buffer, pos, 0)
+            elif value < 0:
+                int_pack(buffer, pos, value)
+            else:
+                uint_pack(buffer, pos, value)
+            pos += byte_width
         if not typed:
-            for i in range(start, len(self._stack), step):
-                self._writeValue(self._stack[i].stored_packed_type(), 1)
+            types_offset = self._offset
+            self._offset = self._newOffset(vec_len)
+            self._buffer[types_offset:self._offset] = bytes(
+                [types[i] << 2 | widths[i] for i in range(start, end, step)])
+        vec_offset += base
         if keys is not None:
-            return _StackValue.valueWithType(vec_offset, ValueType.Map, bit_width)
+            return vec_offset, ValueType.Map, bit_width
         if typed:
-            v_type = vector_type.to_typed_vector(vec_len if fix else 0)
-            return _StackValue.valueWithType(vec_offset, v_type, bit_width)
-        return _StackValue.valueWithType(vec_offset, ValueType.Vector, bit_width)
+            return vec_offset, vector_type.to_typed_vector(vec_len if fix else 0), bit_width
+        return vec_offset, ValueType.Vector, bit_width
+
+
+def _width(value):
+    v = value if value >= 0 else -value
+    if v >> 7 == 0:
+        return BitWidth.Width8
+    if v >> 15 == 0:
+        return BitWidth.Width16
+    if v >> 31 == 0:
+        return BitWidth.Width32
+    return BitWidth.Width64
+
+
+def _offset_width(target, size, index):
+    if size + index - target < 128:
+        return BitWidth.Width8
+    for bit_width in _BIT_WIDTHS:
+        width = 1 << bit_width
+        offset_loc = size + BitWidth.padding_size(size, width) + index * width
+        if _width(offset_loc - target) == bit_width:
+            return bit_width
+    raise Exception("Element is of unknown width")
+
+
+def _narrow_width(vector_type, data, bit_width):
+    if vector_type == ValueType.VectorFloat:
+        if bit_width == BitWidth.Width64 and array.array('d', array.array('f', data)) == data:
+            return BitWidth.Width32
+        return bit_width
+    if vector_type == ValueType.VectorInt:
+        return max(_width(min(data)), _width(max(data)))
+    if vector_type == ValueType.VectorUInt:
+        v = max(data)
+        for width in BitWidth:
+            if v >> (8 << width) == 0:
+                return width
+    return bit_width
 
 
 def _pack(buffer, value, width, offset):
     if value is None:
-        return struct.pack_into("<b", buffer, offset, 0)
-    if isinstance(value, bool):
-        return struct.pack_into("<b", buffer, offset, value)
+        return _UINT_PACKERS[width](buffer, offset, 0)
     if isinstance(value, float):
-        return struct.pack_into("<d", buffer, offset, value)
+        return _FLOAT_PACKERS[width](buffer, offset, value)
     if isinstance(value, int):
-        if width == 1:
-            f = "<B" if value >= 2 ^ 7 else "<b"
-            return struct.pack_into(f, buffer, offset, value)
-        if width == 2:
-            f = "<H" if value >= 2 ^ 15 else "<h"
-            return struct.pack_into(f, buffer, offset, value)
-        if width == 4:
-            f = "<I" if value >= 2 ^ 31 else "<i"
-            return struct.pack_into(f, buffer, offset, value)
-        f = "<Q" if value >= 2 ^ 63 else "<q"
-        return struct.pack_into(f, buffer, offset, value)
+        if value < 0:
+            return _INT_PACKERS[width](buffer, offset, value)
+        return _UINT_PACKERS[width](buffer, offset, value)
 
     raise Exception("Unexpected value type")
+
+
+class FlxShape:
+    def __init__(self, keys, types=None):
+        self.keys = tuple(sorted(keys))
+        for i in range(1, len(self.keys)):
+            if self.keys[i - 1] == self.keys[i]:
+                raise Exception("Duplicate key " + self.keys[i])
+        types = types or {}
+        self._adders = tuple(_shape_adder(types.get(key)) for key in self.keys)
+        declared = tuple(types.get(key) for key in self.keys)
+        if declared and all(t in _SHAPE_FORMATS for t in declared):
+            self._scalar_types = declared
+            self._type_bytes = bytes(_SHAPE_TYPE_BYTES[t] for t in declared)
+            self._int_indexes = tuple(i for i, t in enumerate(declared) if t is int)
+            self._min_width = BitWidth.Width64 if float in declared else _width(len(declared))
+        else:
+            self._scalar_types = None
+        self._packers = {}
+
+    @staticmethod
+    def fromSample(record):
+        types = {}
+        for key, value in record.items():
+            if isinstance(value, collections.abc.Mapping) and value:
+                types[key] = FlxShape.fromSample(value)
+            else:
+                types[key] = type(value)
+        return FlxShape(record.keys(), types)
+
+    def encode(self, record, size=2048):
+        fbb = FlxBuilder(size)
+        fbb._addShapedMapping(self, record)
+        return fbb._finish()
+
+    def _addTo(self, builder, record):
+        builder._addShapedMapping(self, record)
+
+
+_SHAPE_FORMATS = {
+    bool: {1: 'b', 2: 'h', 4: 'i', 8: 'q'},
+    int: {1: 'b', 2: 'h', 4: 'i', 8: 'q'},
+    float: {8: 'd'},
+}
+
+_UINT_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+_SHAPE_TYPE_BYTES = {
+    bool: ValueType.Bool << 2 | BitWidth.Width8,
+    int: ValueType.Int << 2,
+    float: ValueType.Float << 2 | BitWidth.Width64,
+}
+
+
+# methods are looked up on the builder for every call, so replaced methods (see flx_stats) are used as well
+_SHAPE_ADDERS = {
+    type(None): lambda builder, value: builder._add(value),
+    bool: lambda builder, value: builder._add(value),
+    int: lambda builder, value: builder._add(value),
+    float: lambda builder, value: builder._add(value),
+    str: lambda builder, value: builder._addString(value),
+    bytes: lambda builder, value: builder._addBlob(value),
+}
+
+
+def _shape_adder(value_type):
+    if isinstance(value_type, FlxShape):
+        return dict, value_type._addTo
+    return value_type, _SHAPE_ADDERS.get(value_type, lambda builder, value: builder._addDynamic(value))
+
+
+class FlxBuilderPool:
+    def __init__(self, size=2048, max_builders=None, max_size=None, **options):
+        self._size = size
+        self._max_builders = max_builders
+        self._max_size = max_size
+        self._options = options
+        self._builders = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._builders:
+                return self._builders.pop()
+        return FlxBuilder(self._size, **self._options)
+
+    def release(self, builder: FlxBuilder):
+        builder.reset(self._max_size)
+        with self._lock:
+            if self._max_builders is None or len(self._builders) < self._max_builders:
+                self._builders.append(builder)
+
+    @contextlib.contextmanager
+    def builder(self):
+        builder = self.acquire()
+        try:
+            yield builder
+        finally:
+            self.release(builder)
+
+    def fromValue(self, value):
+        with self.builder() as builder:
+            builder._addDynamic(value)
+            return builder._finish()
+
+    def __len__(self):
+        return len(self._builders)
+
+
+class FlxStreamBuilder(FlxBuilder):
+    def __init__(self, sink, chunk_size=1 << 16, **options):
+        super().__init__(chunk_size + 1024, **options)
+        write = getattr(sink, 'write', None)
+        self._write = write if write is not None else sink.sendall
+        self._chunk_size = chunk_size
+
+    def finish(self):
+        if self._containers:
+            raise Exception("Not all vectors and maps are ended")
+        if not self._finished:
+            self._finish_buffer()
+            self._flush(self._offset)
+        return self._flushed
+
+    def finishView(self):
+        raise Exception("Streamed FlexBuffers can not be viewed")
+
+    def finishInto(self, target, offset=0):
+        raise Exception("Streamed FlexBuffers can not be copied")
+
+    def _finish(self):
+        return self.finish()
+
+    def _flush(self, size):
+        with memoryview(self._buffer) as view, view[:size] as chunk:
+            self._write(chunk)
+        tail = self._offset - size
+        self._buffer[:tail] = self._buffer[size:self._offset]
+        self._offset = tail
+        self._flushed += size
+
+    # bytes before the current offset never change, they can be flushed before any new value is written,
+    # as long as the alignment of the remaining buffer is kept
+    def _flushIfFull(self):
+        if self._offset >= self._chunk_size:
+            self._flush(self._offset & ~7)
+
+    def _addString(self, value):
+        self._flushIfFull()
+        return super()._addString(value)
+
+    def _addKey(self, value):
+        self._flushIfFull()
+        return super()._addKey(value)
+
+    def _addBlob(self, value: bytes):
+        self._flushIfFull()
+        return super()._addBlob(value)
+
+    def _addTypedVector(self, value, narrow=False):
+        self._flushIfFull()
+        return super()._addTypedVector(value, narrow)
+
+    def _createVector(self, start, vec_len, step, keys=None):
+        self._flushIfFull()
+        return super()._createVector(start, vec_len, step, keys)
+
+    def _addScalarShaped(self, shape, values, keys):
+        self._flushIfFull()
+        return super()._addScalarShaped(shape, values, keys)
+
+
+class _ClassLayout:
+    __slots__ = ('shape', 'attributes', 'values')
+
+    def __init__(self, fields, include=None, exclude=None, tuple_fields=False):
+        if include is not None:
+            fields = [f for f in fields if f[0] in include]
+        if exclude is not None:
+            fields = [f for f in fields if f[0] not in exclude]
+        fields = sorted(fields)
+        self.shape = FlxShape([f[0] for f in fields], {f[0]: f[2] for f in fields})
+        self.attributes = tuple(f[1] for f in fields)
+        if not self.attributes:
+            getter = None
+        elif tuple_fields:
+            getter = operator.itemgetter(*self.attributes)
+        else:
+            getter = operator.attrgetter(*self.attributes)
+        if len(fields) == 0:
+            self.values = lambda value: ()
+        elif len(fields) == 1:
+            self.values = lambda value: (getter(value),)
+        else:
+            self.values = getter
+
+    def mapping(self, value):
+        try:
+            return dict(zip(self.shape.keys, self.values(value)))
+        except AttributeError:
+            # unset slots are left out of the map
+            return {k: getattr(value, a) for k, a in zip(self.shape.keys, self.attributes) if hasattr(value, a)}
+
+    @staticmethod
+    def create(cls, include=None, exclude=None):
+        if dataclasses.is_dataclass(cls):
+            fields = [(f.name, f.name, f.type) for f in dataclasses.fields(cls)]
+            return _ClassLayout(fields, include, exclude)
+        if issubclass(cls, tuple) and hasattr(cls, '_fields'):
+            annotations = getattr(cls, '__annotations__', {})
+            fields = [(name, i, annotations.get(name)) for i, name in enumerate(cls._fields)]
+            return _ClassLayout(fields, include, exclude, tuple_fields=True)
+        if issubclass(cls, collections.abc.Iterable):
+            # slotted mappings and sequences keep being encoded by their items
+            return None
+        if '__slots__' in vars(cls) and all('__slots__' in vars(c) for c in cls.__mro__[:-1]):
+            fields = []
+            for c in cls.__mro__[:-1]:
+                slots = (c.__slots__,) if isinstance(c.__slots__, str) else c.__slots__
+                annotations = vars(c).get('__annotations__', {})
+                if '__dict__' in slots:
+                    return None
+                for name in slots:
+                    if name == '__weakref__':
+                        continue
+                    attribute = name
+                    if name.startswith('__') and not name.endswith('__'):
+                        attribute = '_' + c.__name__.lstrip('_') + name
+                    fields.append((name, attribute, annotations.get(name)))
+            return _ClassLayout(fields, include, exclude)
+        return None
+
+
+_CLASS_LAYOUTS = {}
+
+
+def _class_layout(cls):
+    layout = _CLASS_LAYOUTS.get(cls)
+    if layout is None:
+        layout = _ClassLayout.create(cls) or False
+        _CLASS_LAYOUTS[cls] = layout
+    return layout
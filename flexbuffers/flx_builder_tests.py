@@ -1,6 +1,10 @@
+import array
+import io
+import threading
 import unittest
 
-from flexbuffers.flx_builder import FlxBuilder
+from flexbuffers.flx_builder import FlxBuilder, FlxBuilderPool, FlxShape, FlxStreamBuilder
+from flexbuffers.flx_value import FlxValue
 
 
 class MyTestCase(unittest.TestCase):
@@ -62,6 +66,352 @@ class MyTestCase(unittest.TestCase):
                          bytes([115, 111, 109, 101, 116, 104, 105, 110, 103, 0,
                                 1, 11, 1, 1, 1, 12, 4, 6, 1, 1, 45, 4, 2, 8, 4, 36, 36, 4, 40, 1]))
 
+    def test_incremental_map(self):
+        fbb = FlxBuilder()
+        fbb.startMap()
+        fbb.addKey("")
+        fbb.addInt(45)
+        fbb.addKey("a")
+        fbb.addInt(12)
+        fbb.endMap()
+        self.assertEqual(fbb.finish(), FlxBuilder.fromValue({"a": 12, "": 45}))
+
+    def test_incremental_unsorted_keys(self):
+        fbb = FlxBuilder()
+        fbb.startMap()
+        fbb.addKey("b")
+        fbb.addString("x")
+        fbb.addKey("a")
+        fbb.startVector()
+        fbb.addBool(True)
+        fbb.addNull()
+        fbb.addFloat(1.5)
+        fbb.addBlob(bytes([1, 2]))
+        fbb.endVector()
+        fbb.endMap()
+        flx = FlxValue.from_bytes(fbb.finish())
+        self.assertEqual(flx.to_object(), {"a": [True, None, 1.5, bytes([1, 2])], "b": "x"})
+
+    def test_incremental_vector_of_maps(self):
+        fbb = FlxBuilder()
+        fbb.startVector()
+        for v in [12, 45]:
+            fbb.startMap()
+            fbb.addKey("something")
+            fbb.add(v)
+            fbb.endMap()
+        fbb.endVector()
+        self.assertEqual(fbb.finish(), FlxBuilder.fromValue([{"something": 12}, {"something": 45}]))
+
+    def test_incremental_misuse(self):
+        fbb = FlxBuilder()
+        self.assertRaises(Exception, fbb.addKey, "a")
+        self.assertRaises(Exception, fbb.endMap)
+        fbb.startMap()
+        self.assertRaises(Exception, fbb.addInt, 1)
+        self.assertRaises(Exception, fbb.endVector)
+        fbb.addKey("a")
+        self.assertRaises(Exception, fbb.addKey, "b")
+        self.assertRaises(Exception, fbb.endMap)
+        fbb.addInt(1)
+        self.assertRaises(Exception, fbb.addKey, "a")
+        self.assertRaises(Exception, fbb.finish)
+        fbb.endMap()
+        self.assertRaises(Exception, fbb.addInt, 1)
+        fbb.finish()
+        self.assertRaises(Exception, fbb.startVector)
+
+    def test_incremental_duplicate_keys(self):
+        fbb = FlxBuilder()
+        fbb.startMap()
+        for key in ["b", "a", "b"]:
+            fbb.addKey(key)
+            fbb.addInt(1)
+        self.assertRaises(Exception, fbb.endMap)
+
+    def test_buffer_growth(self):
+        value = {"name": "x" * 5000, "values": list(range(1000)), "blob": bytes(3000)}
+        expected = FlxBuilder.fromValue(value)
+        for size in [0, 1, 7, 100000]:
+            fbb = FlxBuilder(size)
+            fbb.add(value)
+            self.assertEqual(fbb.finish(), expected)
+
+    def test_estimate_size(self):
+        value = [{"name": "Maxim", "age": 38, "tags": ["a", "b"], "blob": bytes(20)}] * 10
+        self.assertGreaterEqual(FlxBuilder.estimateSize(value), len(FlxBuilder.fromValue(value)))
+        self.assertEqual(FlxBuilder.fromValue(value, estimate=True), FlxBuilder.fromValue(value))
+        self.assertEqual(FlxBuilder.fromValue(value, size=1), FlxBuilder.fromValue(value))
+        self.assertEqual(FlxBuilder.fromValue((v for v in [1, 2, 3]), estimate=True), FlxBuilder.fromValue([1, 2, 3]))
+        for value in [array.array('d', range(1000)), array.array('b', [1] * 300),
+                      memoryview(array.array('i', range(6))).cast('B').cast('i', [2, 3])]:
+            self.assertGreaterEqual(FlxBuilder.estimateSize(value), len(FlxBuilder.fromValue(value)))
+
+    def test_typed_vector_from_array(self):
+        self.assertEqual(FlxBuilder.fromValue(array.array('b', [1, 2, 4])), bytes([3, 1, 2, 4, 3, 44, 1]))
+        self.assertEqual(FlxBuilder.fromValue(array.array('d', [1.1, -256.0])),
+                         bytes([2, 0, 0, 0, 0, 0, 0, 0,
+                                154, 153, 153, 153, 153, 153, 241, 63, 0, 0, 0, 0, 0, 0, 112, 192, 16, 55, 1]))
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(array.array('H', [1, 2, 65535])))
+        self.assertEqual(flx.to_object(), [1, 2, 65535])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue({"v": array.array('f', [0.5, 1.5])}))
+        self.assertEqual(flx.v.to_object(), [0.5, 1.5])
+
+    def test_typed_vector_widens_for_length(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(array.array('b', range(-100, 100))))
+        self.assertEqual(flx._byte_width, 2)
+        self.assertEqual(flx.to_object(), list(range(-100, 100)))
+
+    def test_typed_vector_from_memoryview(self):
+        view = memoryview(array.array('i', range(6))).cast('B').cast('i', [2, 3])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(view))
+        self.assertEqual(flx.to_object(), [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(flx[1].to_array(), array.array('i', [3, 4, 5]))
+        view = memoryview(array.array('b', range(8))).cast('B').cast('b', [2, 2, 2])
+        self.assertEqual(FlxValue.from_bytes(FlxBuilder.fromValue(view)).to_object(),
+                         [[[0, 1], [2, 3]], [[4, 5], [6, 7]]])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(memoryview(bytes([1, 0, 1])).cast('?')))
+        self.assertEqual(flx.to_object(), [True, False, True])
+        self.assertRaises(Exception, FlxBuilder().addTypedVector, memoryview(bytes(4)).cast('c'))
+
+    def test_unsupported_buffer_formats_are_iterated(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(array.array('u', 'abc')))
+        self.assertEqual(flx.to_object(), ['a', 'b', 'c'])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(memoryview(b'ab').cast('c')))
+        self.assertEqual(flx.to_object(), [b'a', b'b'])
+
+    def test_typed_vector_narrowing(self):
+        fbb = FlxBuilder()
+        fbb.addTypedVector(array.array('q', [1, -2, 300]), narrow=True)
+        flx = FlxValue.from_bytes(fbb.finish())
+        self.assertEqual(flx._byte_width, 2)
+        self.assertEqual(flx.to_object(), [1, -2, 300])
+        fbb = FlxBuilder()
+        fbb.addTypedVector(array.array('d', [1.5, 2.25]), narrow=True)
+        self.assertEqual(FlxValue.from_bytes(fbb.finish())._byte_width, 4)
+        fbb = FlxBuilder()
+        fbb.addTypedVector(array.array('d', [1.1]), narrow=True)
+        self.assertEqual(FlxValue.from_bytes(fbb.finish())._byte_width, 8)
+
+    def test_typed_vector_from_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        values = numpy.arange(12, dtype='>i4').reshape(3, 4)
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(values))
+        self.assertEqual(flx.to_object(), values.tolist())
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(numpy.linspace(0, 1, 5)[::2]))
+        self.assertEqual(flx.to_object(), [0.0, 0.5, 1.0])
+        self.assertEqual(FlxValue.from_bytes(FlxBuilder.fromValue(numpy.array(['a', 'bc']))).to_object(), ['a', 'bc'])
+
+    def test_disabled_caches(self):
+        value = [{"a": "foo"}, {"a": "foo"}]
+        deduplicated = FlxBuilder.fromValue(value)
+        for option in ["string_cache", "key_cache", "key_vector_cache"]:
+            buffer = FlxBuilder.fromValue(value, **{option: False})
+            self.assertGreater(len(buffer), len(deduplicated))
+            self.assertEqual(FlxValue.from_bytes(buffer).to_object(), value)
+        fbb = FlxBuilder(string_cache=False, key_cache=False, key_vector_cache=False)
+        fbb.add(value)
+        fbb.finish()
+        self.assertEqual(fbb.cacheStats(), {})
+
+    def test_bounded_string_cache(self):
+        value = ["foo", "bar", "foo", "baz", "foo", "bar"]
+        fbb = FlxBuilder(string_cache=2)
+        fbb.add(value)
+        buffer = fbb.finish()
+        self.assertEqual(FlxValue.from_bytes(buffer).to_object(), value)
+        stats = fbb.cacheStats()["string"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 4, 2))
+        self.assertEqual(stats["hit_rate"], 2 / 6)
+        self.assertGreater(len(buffer), len(FlxBuilder.fromValue(value)))
+
+    def test_max_cached_string_length(self):
+        value = ["foo", "long string", "foo", "long string"]
+        fbb = FlxBuilder(max_cached_string_length=3)
+        fbb.add(value)
+        buffer = fbb.finish()
+        self.assertEqual(FlxValue.from_bytes(buffer).to_object(), value)
+        self.assertEqual(fbb.cacheStats()["string"]["hits"], 1)
+        self.assertEqual(fbb.cacheStats()["string"]["entries"], 1)
+
+    def test_cache_option_validation(self):
+        self.assertRaises(Exception, FlxBuilder, string_cache=-1)
+        self.assertRaises(Exception, FlxBuilder, key_cache="yes")
+
+    def test_reset(self):
+        fbb = FlxBuilder(16)
+        fbb.add({"name": "x" * 100, "values": [-1] * 50, "f": 1.5})
+        fbb.finish()
+        size = len(fbb._buffer)
+        for value in [["foo", 1, -5, 1.3, True], {"a": 12, "": 45}, [[61], 64], "hello", [1, 2, 4]]:
+            fbb.reset()
+            self.assertEqual(len(fbb._buffer), size)
+            fbb.add(value)
+            self.assertEqual(fbb.finish(), FlxBuilder.fromValue(value))
+
+    def test_reset_with_max_size(self):
+        fbb = FlxBuilder(16)
+        fbb.add("x" * 1000)
+        fbb.finish()
+        fbb.reset(max_size=64)
+        self.assertEqual(len(fbb._buffer), 64)
+        fbb.add({"a": [1, 2, 3]})
+        self.assertEqual(fbb.finish(), FlxBuilder.fromValue({"a": [1, 2, 3]}))
+
+    def test_reset_keeps_cache_configuration(self):
+        fbb = FlxBuilder(string_cache=1)
+        fbb.add(["a", "a"])
+        fbb.finish()
+        fbb.reset()
+        fbb.add(["a", "b", "a"])
+        self.assertEqual(FlxValue.from_bytes(fbb.finish()).to_object(), ["a", "b", "a"])
+        self.assertEqual(fbb.cacheStats()["string"]["entries"], 1)
+        self.assertEqual(fbb.cacheStats()["string"]["hits"], 1)
+
+    def test_builder_pool(self):
+        pool = FlxBuilderPool(max_builders=2)
+        with pool.builder() as fbb:
+            fbb.add([1, 2])
+            self.assertEqual(fbb.finish(), FlxBuilder.fromValue([1, 2]))
+        self.assertEqual(len(pool), 1)
+        self.assertIs(pool.acquire(), fbb)
+        builders = [pool.acquire() for _ in range(3)]
+        for builder in builders:
+            pool.release(builder)
+        self.assertEqual(len(pool), 2)
+
+    def test_builder_pool_threads(self):
+        pool = FlxBuilderPool(string_cache=False)
+        errors = []
+
+        def encode(n):
+            for i in range(200):
+                value = {"id": n, "i": i, "name": "x" * (i % 7)}
+                if pool.fromValue(value) != FlxBuilder.fromValue(value):
+                    errors.append(value)
+
+        threads = [threading.Thread(target=encode, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(pool), 4)
+
+    def test_shape(self):
+        records = [{"id": i, "name": "n" + str(i % 3), "score": i / 2, "ok": i % 2 == 0, "tags": ["a"] * i,
+                    "address": {"zip": i, "city": "Bla"}} for i in range(5)]
+        shape = FlxShape.fromSample(records[0])
+        self.assertEqual(shape.keys, ("address", "id", "name", "ok", "score", "tags"))
+        fbb = FlxBuilder()
+        fbb.startVector()
+        for record in records:
+            fbb.addShaped(shape, record)
+        fbb.endVector()
+        self.assertEqual(fbb.finish(), FlxBuilder.fromValue(records))
+        self.assertEqual(shape.encode(records[3]), FlxBuilder.fromValue(records[3]))
+
+    def test_shape_with_unexpected_values(self):
+        shape = FlxShape(["b", "a"], {"a": int, "b": FlxShape(["c"])})
+        records = [{"a": 1, "b": {"c": 1}}, {"a": "x", "b": [1]}, {"a": 1.5, "b": {"d": 2}},
+                   {"a": None, "b": {"c": 1, "d": 2}}, {"a": 1}, {"a": 1, "c": 2}]
+        fbb = FlxBuilder()
+        fbb.startVector()
+        for record in records:
+            fbb.addShaped(shape, record)
+        fbb.endVector()
+        self.assertEqual(FlxValue.from_bytes(fbb.finish()).to_object(), records)
+
+    def test_scalar_shape(self):
+        shape = FlxShape(["id", "ok", "score"], {"id": int, "ok": bool, "score": float})
+        records = [{"id": i, "ok": i % 2 == 0, "score": i / 2} for i in [0, 1, 127, -128, 300, -70000, 2 ** 40]]
+        records += [{"id": 2 ** 63 + 1, "ok": True, "score": 1.5}, {"id": 1.5, "ok": None, "score": 1}]
+        shape_ints = FlxShape(["a", "b"], {"a": int, "b": int})
+        small = [{"a": i, "b": -i} for i in range(0, 100000, 997)]
+        for shape, records in [(shape, records), (shape_ints, small)]:
+            fbb = FlxBuilder()
+            fbb.startVector()
+            for record in records:
+                fbb.addShaped(shape, record)
+            fbb.endVector()
+            self.assertEqual(fbb.finish(), FlxBuilder.fromValue(records))
+            sink = io.BytesIO()
+            fbb = FlxStreamBuilder(sink, chunk_size=64)
+            fbb.startVector()
+            for record in records:
+                fbb.addShaped(shape, record)
+            fbb.endVector()
+            fbb.finish()
+            self.assertEqual(sink.getvalue(), FlxBuilder.fromValue(records))
+
+    def test_shape_duplicate_keys(self):
+        self.assertRaises(Exception, FlxShape, ["a", "a"])
+
+    def test_finish_view(self):
+        fbb = FlxBuilder()
+        fbb.add({"a": [1, 2, 3]})
+        view = fbb.finishView()
+        self.assertTrue(view.readonly)
+        self.assertEqual(view, FlxBuilder.fromValue({"a": [1, 2, 3]}))
+        self.assertEqual(FlxValue.from_bytes(view.tobytes()).a[2].value(), 3)
+        self.assertRaises(Exception, fbb.reset, 1)
+        self.assertRaises(Exception, fbb.reset)
+        part = view[:4]
+        view.release()
+        self.assertRaises(Exception, fbb.reset)
+        part.release()
+        fbb.reset(1)
+        fbb.add(1)
+        self.assertEqual(fbb.finish(), FlxBuilder.fromValue(1))
+
+    def test_finish_into(self):
+        expected = FlxBuilder.fromValue(["foo", 1.5])
+        target = bytearray(len(expected) + 4)
+        fbb = FlxBuilder()
+        fbb.add(["foo", 1.5])
+        self.assertEqual(fbb.finishInto(target, 4), len(expected))
+        self.assertEqual(target[4:], expected)
+        self.assertEqual(target[:4], bytes(4))
+        self.assertRaises(Exception, fbb.finishInto, bytearray(len(expected) - 1))
+        self.assertRaises(Exception, fbb.finishInto, target, 5)
+        self.assertRaises(Exception, fbb.finishInto, bytes(len(expected)))
+        target = array.array('d', [0.0] * 8)
+        self.assertEqual(fbb.finishInto(target), len(expected))
+        self.assertEqual(target.tobytes()[:len(expected)], expected)
+
+    def test_stream_builder(self):
+        value = [{"id": i, "name": "user" + str(i % 50), "tags": ["x" * (i % 30), i / 3], "blob": bytes(i % 40)}
+                 for i in range(500)]
+        sink = io.BytesIO()
+        fbb = FlxStreamBuilder(sink, chunk_size=256)
+        fbb.startVector()
+        for v in value:
+            fbb.add(v)
+        fbb.endVector()
+        size = fbb.finish()
+        self.assertEqual(size, len(sink.getvalue()))
+        self.assertEqual(sink.getvalue(), FlxBuilder.fromValue(value))
+        self.assertLess(len(fbb._buffer), size // 4)
+        self.assertRaises(Exception, fbb.finishView)
+
+    def test_stream_builder_socket_sink(self):
+        class Socket:
+            def __init__(self):
+                self.data = bytearray()
+
+            def sendall(self, data):
+                self.data += data
+
+        sink = Socket()
+        fbb = FlxStreamBuilder(sink, chunk_size=64, string_cache=16, key_cache=16)
+        value = {"values": [{"a": "x" * i, "b": [i] * i} for i in range(40)]}
+        fbb.add(value)
+        fbb.finish()
+        self.assertEqual(FlxValue.from_bytes(bytes(sink.data)).to_object(), value)
+
     def _build_single(self, value, data):
         fbb = FlxBuilder(1)
         fbb._add(value)
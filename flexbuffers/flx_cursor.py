@@ -0,0 +1,105 @@
+from .flx_decoder import _terminator
+from .value_types import ValueType
+
+
+_VALUE_TYPES = [None] * 64
+for _value_type in ValueType:
+    _VALUE_TYPES[_value_type] = _value_type
+
+
+class FlxCursor:
+    __slots__ = ('value', 'index', '_source', '_start', '_width', '_length', '_types', '_element_type')
+
+    def __init__(self, source):
+        value_type = source._value_type
+        if not value_type.is_a_vector() and value_type != ValueType.Map:
+            raise Exception("Value is not a vector or map")
+        self._source = source
+        self._start = source._compute_indirect()
+        self._width = source._byte_width
+        self._length = len(source)
+        if value_type.is_typed_vector():
+            self._types = None
+            self._element_type = ValueType(value_type.typed_vector_element_type())
+        elif value_type.is_fixed_typed_vector():
+            self._types = None
+            self._element_type = ValueType(value_type.fixed_typed_vector_element_type())
+        else:
+            self._types = self._start + self._length * self._width
+            self._element_type = None
+        self.index = -1
+        self.value = source._child(self._start, self._width, 0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        self.index = -1
+        while self.next():
+            yield self.value
+
+    def next(self):
+        if self.index + 1 >= self._length:
+            self.index = self._length
+            return False
+        self._move(self.index + 1)
+        return True
+
+    def seek(self, index):
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise Exception("Index " + str(index) + " is out of range")
+        self._move(index)
+        return self.value
+
+    def key(self):
+        if self._source._value_type != ValueType.Map or not 0 <= self.index < self._length:
+            return None
+        start = self._source._key_start(self.index)
+        buffer = self._source._buffer
+        return str(buffer[start:_terminator(buffer, start, len(buffer))], 'utf-8')
+
+    def _move(self, index):
+        self.index = index
+        value = self.value
+        value._offset = self._start + index * self._width
+        if self._types is None:
+            value._byte_width = 1
+            value._value_type = self._element_type
+        else:
+            packed_type = self._source._buffer[self._types + index]
+            value._byte_width = 1 << (packed_type & 3)
+            value._value_type = _value_type(packed_type)
+        value._len = None
+        value._indirect = None
+        value._keys_offset = None
+        value._keys_width = None
+
+
+def visit(source, callback):
+    value_type = source._value_type
+    if not value_type.is_a_vector() and value_type != ValueType.Map:
+        raise Exception("Value is not a vector or map")
+    start = source._compute_indirect()
+    width = source._byte_width
+    length = len(source)
+    if value_type.is_typed_vector() or value_type.is_fixed_typed_vector():
+        if value_type.is_typed_vector():
+            element_type = ValueType(value_type.typed_vector_element_type())
+        else:
+            element_type = ValueType(value_type.fixed_typed_vector_element_type())
+        for offset in range(start, start + length * width, width):
+            callback(element_type, offset, width)
+        return
+    buffer = source._buffer
+    types = start + length * width
+    for index in range(length):
+        callback(_value_type(buffer[types + index]), start + index * width, width)
+
+
+def _value_type(packed_type):
+    value_type = _VALUE_TYPES[packed_type >> 2]
+    if value_type is None:
+        raise Exception("Bad type " + str(packed_type >> 2))
+    return value_type
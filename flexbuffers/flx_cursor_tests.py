@@ -0,0 +1,63 @@
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_value import (FlxValue)
+from .value_types import ValueType
+
+
+class MyTestCase(unittest.TestCase):
+    def test_vector(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([1, "two", 3.5, None, [4], {"five": 5}]))
+        cursor = flx.cursor()
+        self.assertEqual(len(cursor), 6)
+        values = []
+        for value in cursor:
+            self.assertIs(value, cursor.value)
+            values.append(value.to_object())
+        self.assertEqual(values, [1, "two", 3.5, None, [4], {"five": 5}])
+        self.assertEqual(cursor.seek(5)["five"].value(), 5)
+        self.assertEqual(cursor.seek(-5).value(), "two")
+        self.assertIsNone(cursor.key())
+
+    def test_memoryview_map(self):
+        flx = FlxValue.from_bytes(memoryview(FlxBuilder.fromValue({"b": 1, "a": "x"})))
+        cursor = flx.cursor()
+        keys = []
+        while cursor.next():
+            keys.append(cursor.key())
+        self.assertEqual(keys, ["a", "b"])
+        self.assertRaises(Exception, cursor.seek, 6)
+
+    def test_typed_vectors(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([1, 2, 300]))
+        self.assertEqual([value.value() for value in flx.cursor()], [1, 2, 300])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([1.5, 2.5]))
+        self.assertEqual([value.value() for value in flx.cursor()], [1.5, 2.5])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(["a", "bc"]))
+        self.assertEqual([value.value() for value in flx.cursor()], ["a", "bc"])
+
+    def test_map(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue({"b": [1, 2], "a": "x", "c": {"d": 1}}))
+        cursor = flx.cursor()
+        items = []
+        while cursor.next():
+            items.append((cursor.key(), cursor.value.to_object()))
+        self.assertEqual(items, [("a", "x"), ("b", [1, 2]), ("c", {"d": 1})])
+        self.assertFalse(cursor.next())
+        self.assertIsNone(cursor.key())
+
+    def test_not_a_container(self):
+        self.assertRaises(Exception, FlxValue.from_bytes(FlxBuilder.fromValue(1)).cursor)
+
+    def test_visit(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([1, "x", 2.5]))
+        visited = []
+        flx.visit(lambda value_type, offset, width: visited.append(value_type))
+        self.assertEqual(visited, [ValueType.Int, ValueType.String, ValueType.Float])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([1, 2, 3]))
+        total = []
+        flx.visit(lambda value_type, offset, width: total.append(flx._buffer[offset]))
+        self.assertEqual(sum(total), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+import struct
+from .value_types import ValueType
+
+
+_INT_UNPACKERS = {1: struct.Struct("<b").unpack_from, 2: struct.Struct("<h").unpack_from,
+                  4: struct.Struct("<i").unpack_from, 8: struct.Struct("<q").unpack_from}
+_UINT_UNPACKERS = {1: struct.Struct("<B").unpack_from, 2: struct.Struct("<H").unpack_from,
+                   4: struct.Struct("<I").unpack_from, 8: struct.Struct("<Q").unpack_from}
+_FLOAT_UNPACKERS = {4: struct.Struct("<f").unpack_from, 8: struct.Struct("<d").unpack_from}
+
+_ELEMENT_FORMATS = {
+    ValueType.Int: {1: 'b', 2: 'h', 4: 'i', 8: 'q'},
+    ValueType.UInt: {1: 'B', 2: 'H', 4: 'I', 8: 'Q'},
+    ValueType.Float: {4: 'f', 8: 'd'},
+    ValueType.Bool: {1: 'B', 2: 'H', 4: 'I', 8: 'Q'},
+}
+
+_MAP = 0
+_VECTOR = 1
+_TYPED_VECTOR = 2
+_FIXED_VECTOR = 3
+
+
+def decode(buffer, offset, parent_width, packed_type):
+    reader = _READERS[packed_type]
+    if reader is not None:
+        return reader(buffer, offset, parent_width)
+    key_lists = {}
+    result, frame = _open(buffer, offset, parent_width, packed_type, key_lists)
+    if frame is None:
+        return result
+    readers = _READERS
+    stack = [frame]
+    while stack:
+        frame = stack[-1]
+        values, keys, data, types, width, length, i = frame
+        while i < length:
+            packed = buffer[types + i]
+            reader = readers[packed]
+            if reader is not None:
+                value = reader(buffer, data + i * width, width)
+                frame = None
+            else:
+                value, frame = _open(buffer, data + i * width, width, packed, key_lists)
+            if keys is None:
+                values.append(value)
+            else:
+                values[keys[i]] = value
+            i += 1
+            if frame is not None:
+                stack[-1][6] = i
+                stack.append(frame)
+                break
+        else:
+            stack.pop()
+    return result
+
+
+def decode_bytes(buffer):
+    if len(buffer) < 3:
+        raise Exception("Buffer needs to be bigger than 2 bytes")
+    byte_width = buffer[-1]
+    return decode(buffer, len(buffer) - byte_width - 2, byte_width, buffer[-2])
+
+
+def _open(buffer, offset, parent_width, packed_type, key_lists):
+    values, keys, data, types, width, length = _container(buffer, offset, parent_width, packed_type, key_lists)
+    if data is None:
+        return values, None
+    values = [] if keys is None else {}
+    return values, [values, keys, data, types, width, length, 0]
+
+
+def _container(buffer, offset, parent_width, packed_type, key_lists):
+    kind = _CONTAINERS[packed_type]
+    byte_width = 1 << (packed_type & 3)
+    start = _indirect(buffer, offset, parent_width)
+    if kind == _FIXED_VECTOR:
+        value_type = ValueType(packed_type >> 2)
+        element_type = ValueType(value_type.fixed_typed_vector_element_type())
+        length = value_type.fixed_typed_vector_element_size()
+        return _unpack(buffer, start, length, element_type, byte_width), None, None, None, byte_width, length
+    length = _INT_UNPACKERS[byte_width](buffer, start - byte_width)[0]
+    if kind == _TYPED_VECTOR:
+        element_type = ValueType(ValueType(packed_type >> 2).typed_vector_element_type())
+        if element_type == ValueType.Key:
+            values = [_key(buffer, start + i * byte_width, byte_width) for i in range(length)]
+        elif element_type == ValueType.String:
+            values = [_string(buffer, _indirect(buffer, start + i * byte_width, byte_width), 1)
+                      for i in range(length)]
+        else:
+            values = _unpack(buffer, start, length, element_type, byte_width)
+        return values, None, None, None, byte_width, length
+    if kind == _VECTOR:
+        return None, None, start, start + length * byte_width, byte_width, length
+    keys_offset = start - byte_width * 3
+    keys_start = keys_offset - _INT_UNPACKERS[byte_width](buffer, keys_offset)[0]
+    keys = key_lists.get(keys_start)
+    if keys is None:
+        keys_width = _INT_UNPACKERS[byte_width](buffer, keys_offset + byte_width)[0]
+        if keys_width not in _INT_UNPACKERS:
+            raise Exception("Bad width " + str(keys_width))
+        keys = key_lists[keys_start] = [_key(buffer, keys_start + i * keys_width, keys_width)
+                                        for i in range(length)]
+    return None, keys, start, start + length * byte_width, byte_width, length
+
+
+def _unpack(buffer, start, length, element_type, width):
+    formats = _ELEMENT_FORMATS.get(element_type)
+    if formats is None or width not in formats:
+        raise Exception("Bad width " + str(width))
+    values = struct.unpack_from('<%d%s' % (length, formats[width]), buffer, start)
+    if element_type == ValueType.Bool:
+        return [v != 0 for v in values]
+    return list(values)
+
+
+def _indirect(buffer, offset, width):
+    target = offset - _INT_UNPACKERS[width](buffer, offset)[0]
+    if target < 0 or target >= len(buffer):
+        raise Exception("Bad offset")
+    return target
+
+
+def _terminator(buffer, start, end):
+    # memoryview has no find, keys are short so a scan is fine
+    if isinstance(buffer, memoryview):
+        for i in range(start, end):
+            if buffer[i] == 0:
+                return i
+        return -1
+    return buffer.find(b'\0', start, end)
+
+
+def _string(buffer, start, width):
+    size = _INT_UNPACKERS[width](buffer, start - width)[0]
+    while buffer[start + size] != 0:
+        width = width << 1
+        size = _INT_UNPACKERS[width](buffer, start - width)[0]
+    return str(buffer[start:start + size], 'utf-8')
+
+
+def _key(buffer, offset, width):
+    start = _indirect(buffer, offset, width)
+    end = _terminator(buffer, start, len(buffer))
+    if end < 0:
+        raise Exception("Key is not terminated")
+    return str(buffer[start:end], 'utf-8')
+
+
+def _length(buffer, offset, parent_width, packed_type):
+    value_type = ValueType(packed_type >> 2)
+    if value_type.is_fixed_typed_vector():
+        return value_type.fixed_typed_vector_element_size()
+    byte_width = 1 << (packed_type & 3)
+    return _INT_UNPACKERS[byte_width](buffer, _indirect(buffer, offset, parent_width) - byte_width)[0]
+
+
+def _element(buffer, offset, parent_width, packed_type, index, length):
+    byte_width = 1 << (packed_type & 3)
+    start = _indirect(buffer, offset, parent_width)
+    kind = _CONTAINERS[packed_type]
+    if kind == _VECTOR:
+        return start + index * byte_width, byte_width, buffer[start + length * byte_width + index]
+    value_type = ValueType(packed_type >> 2)
+    if kind == _TYPED_VECTOR:
+        element_type = value_type.typed_vector_element_type()
+    else:
+        element_type = value_type.fixed_typed_vector_element_type()
+    return start + index * byte_width, byte_width, element_type << 2
+
+
+def _lookup(buffer, offset, parent_width, packed_type, key):
+    byte_width = 1 << (packed_type & 3)
+    start = _indirect(buffer, offset, parent_width)
+    unpack = _INT_UNPACKERS[byte_width]
+    length = unpack(buffer, start - byte_width)[0]
+    keys_offset = start - byte_width * 3
+    keys_start = keys_offset - unpack(buffer, keys_offset)[0]
+    keys_width = unpack(buffer, keys_offset + byte_width)[0]
+    unpack_key = _INT_UNPACKERS[keys_width]
+    key_len = len(key)
+    low = 0
+    high = length - 1
+    while low <= high:
+        mid = (high + low) >> 1
+        key_offset = keys_start + mid * keys_width
+        key_start = key_offset - unpack_key(buffer, key_offset)[0]
+        stored = bytes(buffer[key_start:key_start + key_len])
+        if key > stored:
+            low = mid + 1
+        elif key < stored or buffer[key_start + key_len] != 0:
+            high = mid - 1
+        else:
+            return start + mid * byte_width, byte_width, buffer[start + length * byte_width + mid]
+    return None
+
+
+def _inline_reader(unpackers, convert=None):
+    def read(buffer, offset, parent_width):
+        return unpackers[parent_width](buffer, offset)[0]
+
+    def read_converted(buffer, offset, parent_width):
+        return convert(unpackers[parent_width](buffer, offset)[0])
+    return read if convert is None else read_converted
+
+
+def _indirect_reader(unpackers, byte_width):
+    unpack = unpackers.get(byte_width)
+
+    def read(buffer, offset, parent_width):
+        if unpack is None:
+            raise Exception("Bad width " + str(byte_width))
+        return unpack(buffer, _indirect(buffer, offset, parent_width))[0]
+    return read
+
+
+def _string_reader(byte_width):
+    def read(buffer, offset, parent_width):
+        return _string(buffer, _indirect(buffer, offset, parent_width), byte_width)
+    return read
+
+
+def _blob_reader(byte_width):
+    def read(buffer, offset, parent_width):
+        start = _indirect(buffer, offset, parent_width)
+        size = _INT_UNPACKERS[byte_width](buffer, start - byte_width)[0]
+        return bytes(buffer[start:start + size])
+    return read
+
+
+def _null_reader(buffer, offset, parent_width):
+    return None
+
+
+def _float_reader(buffer, offset, parent_width):
+    unpack = _FLOAT_UNPACKERS.get(parent_width)
+    if unpack is None:
+        raise Exception("Bad width " + str(parent_width))
+    return unpack(buffer, offset)[0]
+
+
+def _build_tables():
+    readers = [_null_reader] * 256
+    containers = [None] * 256
+    for packed_type in range(256):
+        try:
+            value_type = ValueType(packed_type >> 2)
+        except ValueError:
+            continue
+        byte_width = 1 << (packed_type & 3)
+        if value_type == ValueType.Int:
+            readers[packed_type] = _inline_reader(_INT_UNPACKERS)
+        elif value_type == ValueType.UInt:
+            readers[packed_type] = _inline_reader(_UINT_UNPACKERS)
+        elif value_type == ValueType.Float:
+            readers[packed_type] = _float_reader
+        elif value_type == ValueType.Bool:
+            readers[packed_type] = _inline_reader(_INT_UNPACKERS, bool)
+        elif value_type == ValueType.IndirectInt:
+            readers[packed_type] = _indirect_reader(_INT_UNPACKERS, byte_width)
+        elif value_type == ValueType.IndirectUInt:
+            readers[packed_type] = _indirect_reader(_UINT_UNPACKERS, byte_width)
+        elif value_type == ValueType.IndirectFloat:
+            readers[packed_type] = _indirect_reader(_FLOAT_UNPACKERS, byte_width)
+        elif value_type == ValueType.String:
+            readers[packed_type] = _string_reader(byte_width)
+        elif value_type == ValueType.Key:
+            readers[packed_type] = _key
+        elif value_type == ValueType.Blob:
+            readers[packed_type] = _blob_reader(byte_width)
+        elif value_type == ValueType.Map:
+            readers[packed_type] = None
+            containers[packed_type] = _MAP
+        elif value_type == ValueType.Vector:
+            readers[packed_type] = None
+            containers[packed_type] = _VECTOR
+        elif value_type.is_typed_vector():
+            readers[packed_type] = None
+            containers[packed_type] = _TYPED_VECTOR
+        elif value_type.is_fixed_typed_vector():
+            readers[packed_type] = None
+            containers[packed_type] = _FIXED_VECTOR
+    return readers, containers
+
+
+_READERS, _CONTAINERS = _build_tables()
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_decoder import (decode_bytes)
+from .flx_value import (FlxValue)
+
+
+class MyTestCase(unittest.TestCase):
+    def test_scalars(self):
+        for value in [None, True, False, 0, -1, 300, 2 ** 40, 1.5, 0.1, "", "hello", "ünï", b"\0blob"]:
+            self.assertEqual(decode_bytes(FlxBuilder.fromValue(value)), value)
+
+    def test_containers(self):
+        value = {
+            "a": [1, 2, 3],
+            "b": [1.5, 2.5],
+            "c": [True, False, True],
+            "d": ["x", "y"],
+            "e": [1, "x", None, 2.5, [], {}],
+            "f": [{"k": 1, "l": 2}, {"k": 3, "l": 4}],
+            "g": {"nested": {"deeper": [b"\1\2"]}},
+        }
+        buffer = FlxBuilder.fromValue(value)
+        self.assertEqual(decode_bytes(buffer), value)
+        self.assertEqual(FlxValue.from_bytes(buffer).to_object(), value)
+        self.assertEqual(FlxValue.from_bytes(buffer)["f"][1].to_object(), {"k": 3, "l": 4})
+        self.assertEqual(FlxValue.from_bytes(buffer)["a"][2].to_object(), 3)
+
+    def test_memoryview(self):
+        value = {"a": [1, 2, 3], "d": ["x", "y"], "f": [{"k": 1, "l": 2}], "s": "text"}
+        buffer = memoryview(FlxBuilder.fromValue(value))
+        self.assertEqual(decode_bytes(buffer), value)
+        self.assertEqual(FlxValue.from_bytes(buffer).json(), FlxValue.from_bytes(bytes(buffer)).json())
+        self.assertEqual(dict(FlxValue.from_bytes(buffer).view())["s"], "text")
+
+    def test_keys_vector(self):
+        self.assertEqual(decode_bytes(bytes([102, 111, 111, 0, 98, 97, 114, 0, 2, 9, 6, 2, 56, 1])), ["foo", "bar"])
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        fbb = FlxBuilder()
+        for _ in range(depth):
+            fbb.startVector()
+        for _ in range(depth):
+            fbb.endVector()
+        value = decode_bytes(fbb.finish())
+        for _ in range(depth - 1):
+            value = value[0]
+        self.assertEqual(value, [])
+
+    def test_bad_offset(self):
+        self.assertRaises(Exception, decode_bytes, bytes([3, 102, 111, 0, 120, 20, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import base64
+import io
+import json.encoder
+from .flx_decoder import (_CONTAINERS, _FIXED_VECTOR, _INT_UNPACKERS, _READERS, _TYPED_VECTOR, _container,
+                          _indirect, _unpack)
+from .value_types import ValueType
+
+
+_encode_string = json.encoder.encode_basestring
+
+_SLICE_SIZE = 1024
+
+
+def iter_json(buffer, offset, parent_width, packed_type, indent=None, chunk_size=1 << 16):
+    if indent is not None and not isinstance(indent, str):
+        indent = ' ' * indent
+    reader = _READERS[packed_type]
+    if reader is not None:
+        yield _encode(reader(buffer, offset, parent_width))
+        return
+    colon = ':' if indent is None else ': '
+    key_lists = {}
+    parts = []
+    size = 0
+    stack = [_open(buffer, offset, parent_width, packed_type, key_lists, parts)]
+    while stack:
+        frame = stack[-1]
+        keys, data, types, width, length, i, element_type = frame
+        depth = len(stack)
+        newline = '' if indent is None else '\n' + indent * depth
+        values = None
+        values_start = i
+        while i < length:
+            part = ',' + newline if i else newline
+            if keys is not None:
+                part += _encode_string(keys[i]) + colon
+            if element_type is not None:
+                if values is None or i - values_start >= len(values):
+                    values_start = i
+                    values = _slice(buffer, data, width, element_type, i, min(i + _SLICE_SIZE, length))
+                part += _encode(values[i - values_start])
+            else:
+                packed = buffer[types + i]
+                reader = _READERS[packed]
+                if reader is None:
+                    parts.append(part)
+                    frame[5] = i + 1
+                    stack.append(_open(buffer, data + i * width, width, packed, key_lists, parts))
+                    size += len(part) + 1
+                    break
+                part += _encode(reader(buffer, data + i * width, width))
+            parts.append(part)
+            size += len(part)
+            i += 1
+            if size >= chunk_size:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+        else:
+            stack.pop()
+            part = '}' if keys is not None else ']'
+            if indent is not None and length > 0:
+                part = '\n' + indent * (depth - 1) + part
+            parts.append(part)
+            size += len(part)
+    if parts:
+        yield ''.join(parts)
+
+
+def write_json(fp, buffer, offset, parent_width, packed_type, indent=None, chunk_size=1 << 16):
+    chunks = iter_json(buffer, offset, parent_width, packed_type, indent, chunk_size)
+    if isinstance(fp, io.TextIOBase):
+        for chunk in chunks:
+            fp.write(chunk)
+    else:
+        for chunk in chunks:
+            fp.write(chunk.encode('utf-8'))
+
+
+def _open(buffer, offset, parent_width, packed_type, key_lists, parts):
+    kind = _CONTAINERS[packed_type]
+    if kind == _TYPED_VECTOR or kind == _FIXED_VECTOR:
+        # typed vectors are read slice by slice, so big numeric vectors are never decoded at once
+        width = 1 << (packed_type & 3)
+        data = _indirect(buffer, offset, parent_width)
+        value_type = ValueType(packed_type >> 2)
+        if kind == _FIXED_VECTOR:
+            element_type = ValueType(value_type.fixed_typed_vector_element_type())
+            length = value_type.fixed_typed_vector_element_size()
+        else:
+            element_type = ValueType(value_type.typed_vector_element_type())
+            length = _INT_UNPACKERS[width](buffer, data - width)[0]
+        parts.append('[')
+        return [None, data, None, width, length, 0, element_type]
+    values, keys, data, types, width, length = _container(buffer, offset, parent_width, packed_type, key_lists)
+    parts.append('{' if keys is not None else '[')
+    return [keys, data, types, width, length, 0, None]
+
+
+def _slice(buffer, data, width, element_type, start, stop):
+    if element_type == ValueType.Key or element_type == ValueType.String:
+        reader = _READERS[element_type << 2]
+        return [reader(buffer, data + i * width, width) for i in range(start, stop)]
+    return _unpack(buffer, data + start * width, stop - start, element_type, width)
+
+
+def _encode(value):
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, str):
+        return _encode_string(value)
+    if isinstance(value, float):
+        return float.__repr__(value) if value - value == 0 else json.dumps(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return '"' + base64.b64encode(value).decode('ascii') + '"'
@@ -0,0 +1,63 @@
+import io
+import json
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_value import (FlxValue)
+
+
+class MyTestCase(unittest.TestCase):
+    value = {
+        "name": "Maxim \"Max\"",
+        "age": 38,
+        "weight": 72.5,
+        "flags": [True, False],
+        "ids": [1, 2, 300],
+        "pos": [1.5, 2.5, 3.5],
+        "mixed": [None, "ünï", {}, [], {"x": -1}],
+    }
+
+    def test_minified(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(self.value))
+        self.assertEqual(flx.json(), json.dumps(self.value, separators=(',', ':'), ensure_ascii=False, sort_keys=True))
+        self.assertEqual(flx["mixed"].json(), '[null,"ünï",{},[],{"x":-1}]')
+        self.assertEqual(flx["age"].json(), '38')
+
+    def test_pretty(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(self.value))
+        self.assertEqual(flx.json(indent=2), json.dumps(self.value, indent=2, ensure_ascii=False, sort_keys=True))
+        self.assertEqual(flx.json(indent='\t'), json.dumps(self.value, indent='\t', ensure_ascii=False, sort_keys=True))
+
+    def test_blob(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue({"data": b"\x00\x01\xff"}))
+        self.assertEqual(flx.json(), '{"data":"AAH/"}')
+
+    def test_chunks(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([self.value] * 100))
+        chunks = list(flx.iter_json(chunk_size=256))
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 512 for chunk in chunks))
+        self.assertEqual(''.join(chunks), flx.json())
+
+    def test_typed_vector_chunks(self):
+        value = {
+            "floats": [i * 0.5 for i in range(5000)],
+            "strings": ["s%d" % i for i in range(3000)],
+            "fixed": [1, 2, 3],
+        }
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(value))
+        chunks = list(flx.iter_json(chunk_size=256))
+        self.assertTrue(all(len(chunk) < 512 for chunk in chunks))
+        self.assertEqual(''.join(chunks), json.dumps(value, separators=(',', ':'), sort_keys=True))
+
+    def test_write(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(self.value))
+        text = io.StringIO()
+        flx.write_json(text, indent=2)
+        self.assertEqual(text.getvalue(), flx.json(indent=2))
+        binary = io.BytesIO()
+        flx.write_json(binary)
+        self.assertEqual(binary.getvalue(), flx.json().encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
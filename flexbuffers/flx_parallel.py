@@ -0,0 +1,223 @@
+import array
+import collections
+import itertools
+import multiprocessing
+import os
+import sys
+from multiprocessing import (resource_tracker, shared_memory)
+from .flx_builder import (FlxBuilder, FlxBuilderPool)
+from .flx_value import FlxValue
+
+
+class FlxBatch:
+    __slots__ = ('offsets', 'payload')
+
+    def __init__(self, offsets, payload):
+        self.offsets = offsets
+        self.payload = payload
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return bytes(self.view(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def view(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Index out of range")
+        return memoryview(self.payload)[self.offsets[index]:self.offsets[index + 1]]
+
+
+def encode_batch(records, processes=None, chunk_size=1000, max_pending=None, pool=None, **options):
+    batch = FlxBatch(array.array('Q', [0]), bytearray())
+    for result in _encode(records, processes, chunk_size, max_pending, pool, options):
+        _collect(result, batch)
+    return batch
+
+
+def iter_encode(records, processes=None, chunk_size=1000, max_pending=None, pool=None, **options):
+    for result in _encode(records, processes, chunk_size, max_pending, pool, options):
+        yield _collect(result, FlxBatch(array.array('Q', [0]), bytearray()))
+
+
+def map_vector(source, function=None, processes=None, chunk_size=10000, pool=None):
+    if isinstance(source, (str, os.PathLike)):
+        with FlxValue.from_file(source) as root:
+            length = _vector_length(root)
+        return _map(_map_file_range, (os.fspath(source),), length, function, processes, chunk_size, pool)
+    length = _vector_length(FlxValue.from_bytes(source))
+    size = len(source)
+    segment = _create_segment(size)
+    try:
+        segment.buf[:size] = source
+        return _map(_map_segment_range, (segment.name, size), length, function, processes, chunk_size, pool)
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def _vector_length(root):
+    if not root._value_type.is_a_vector():
+        raise Exception("Root value is not a vector")
+    return len(root)
+
+
+def _map(worker, args, length, function, processes, chunk_size, pool):
+    processes = processes or os.cpu_count() or 1
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(processes)
+    try:
+        pending = [pool.apply_async(worker, args + (start, min(start + chunk_size, length), function))
+                   for start in range(0, length, chunk_size)]
+        results = []
+        for result in pending:
+            results.extend(result.get())
+        return results
+    finally:
+        if own_pool:
+            pool.terminate()
+            pool.join()
+
+
+def _map_file_range(path, start, stop, function):
+    with FlxValue.from_file(path) as root:
+        return _map_range(root, start, stop, function)
+
+
+def _map_segment_range(name, size, start, stop, function):
+    segment = _attach_segment(name)
+    try:
+        with segment.buf[:size] as buffer:
+            return _map_range(FlxValue.from_bytes(buffer), start, stop, function)
+    finally:
+        segment.close()
+
+
+def _map_range(root, start, stop, function):
+    if function is None:
+        return [root[i].to_object() for i in range(start, stop)]
+    return [function(root[i]) for i in range(start, stop)]
+
+
+def _encode(records, processes, chunk_size, max_pending, pool, options):
+    processes = processes or os.cpu_count() or 1
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(processes)
+    if max_pending is None:
+        max_pending = 2 * processes
+    pending = collections.deque()
+    records = iter(records)
+    try:
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+            pending.append(pool.apply_async(_encode_chunk, (chunk, options)))
+            while len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        # segments of chunks which were not collected would leak otherwise
+        while pending:
+            try:
+                _unlink(pending.popleft().get()[0])
+            except Exception:
+                pass
+        if own_pool:
+            pool.terminate()
+            pool.join()
+
+
+def _collect(result, batch):
+    name, sizes = result
+    start = len(batch.payload)
+    total = start
+    for size in sizes:
+        total += size
+        batch.offsets.append(total)
+    segment = shared_memory.SharedMemory(name)
+    try:
+        batch.payload += segment.buf[:total - start]
+    finally:
+        segment.close()
+        segment.unlink()
+    return batch
+
+
+def _unlink(name):
+    segment = shared_memory.SharedMemory(name)
+    segment.close()
+    segment.unlink()
+
+
+def _create_segment(size):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    return shared_memory.SharedMemory(create=True, size=size)
+
+
+def _attach_segment(name):
+    # workers share the resource tracker of the parent, which unregisters the segment when it unlinks it
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)
+
+
+def _untrack(segment):
+    if sys.version_info < (3, 13) and os.name == 'posix':
+        # the consumer unlinks the segment, the tracker of the worker would try to unlink it again on exit
+        resource_tracker.unregister(segment._name, "shared_memory")
+
+
+def _grow_segment(segment, used, size):
+    grown = _create_segment(max(size, 2 * segment.size))
+    grown.buf[:used] = segment.buf[:used]
+    segment.close()
+    segment.unlink()
+    return grown
+
+
+_pools = {}
+_record_sizes = {}
+
+
+def _encode_chunk(chunk, options):
+    key = tuple(sorted(options.items()))
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = FlxBuilderPool(**options)
+    record_size = _record_sizes.get(key)
+    if record_size is None:
+        record_size = FlxBuilder.estimateSize(chunk[0])
+    # records are encoded straight into the segment, it only grows if the guessed size was too small
+    segment = _create_segment(record_size * len(chunk))
+    sizes = []
+    position = 0
+    try:
+        for record in chunk:
+            with pool.builder() as builder:
+                builder._addDynamic(record)
+                builder._finish_buffer()
+                size = builder._offset
+                if position + size > segment.size:
+                    segment = _grow_segment(segment, position, position + size)
+                builder.finishInto(segment.buf, position)
+            sizes.append(size)
+            position += size
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    _record_sizes[key] = position * 5 // (4 * len(chunk)) + 1
+    _untrack(segment)
+    segment.close()
+    return segment.name, sizes
@@ -0,0 +1,72 @@
+import itertools
+import multiprocessing
+import os
+import tempfile
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_parallel import (encode_batch, iter_encode, map_vector)
+from .flx_value import (FlxValue)
+
+
+def _name(value):
+    return value["name"].value()
+
+
+class MyTestCase(unittest.TestCase):
+    records = [{"id": i, "name": "name %d" % i, "values": [i, i * 2.5]} for i in range(250)]
+
+    def test_encode_batch(self):
+        batch = encode_batch(self.records, processes=2, chunk_size=40)
+        self.assertEqual(len(batch), len(self.records))
+        self.assertEqual(batch.offsets[-1], len(batch.payload))
+        for i, record in enumerate(self.records):
+            self.assertEqual(batch[i], FlxBuilder.fromValue(record))
+        self.assertEqual(FlxValue.from_bytes(batch[-1])["id"].value(), 249)
+        self.assertEqual(bytes(batch.view(3)), batch[3])
+        self.assertRaises(IndexError, batch.view, 250)
+
+    def test_options_and_pool(self):
+        with multiprocessing.Pool(2) as pool:
+            batch = encode_batch(iter(self.records), chunk_size=100, pool=pool, string_cache=False)
+            self.assertEqual(list(batch), [FlxBuilder.fromValue(r, string_cache=False) for r in self.records])
+
+    def test_unbounded_iterator(self):
+        batches = iter_encode(itertools.count(), processes=2, chunk_size=10, max_pending=2)
+        values = []
+        for batch in itertools.islice(batches, 3):
+            values.extend(FlxValue.from_bytes(buffer).value() for buffer in batch)
+        batches.close()
+        self.assertEqual(values, list(range(30)))
+
+    def test_growing_segment(self):
+        # the size estimation counts characters, so multi byte strings need a bigger segment
+        records = ["ü" * i * 10 for i in range(1, 100)]
+        batch = encode_batch(records, processes=2, chunk_size=40)
+        self.assertEqual(list(batch), [FlxBuilder.fromValue(r) for r in records])
+
+    def test_errors(self):
+        self.assertRaises(Exception, encode_batch, [1, 2, 1j], processes=2, chunk_size=1)
+        self.assertEqual(len(encode_batch([], processes=2)), 0)
+
+    def test_map_vector(self):
+        buffer = FlxBuilder.fromValue(self.records)
+        self.assertEqual(map_vector(buffer, processes=2, chunk_size=30), self.records)
+        self.assertEqual(map_vector(buffer, _name, processes=2, chunk_size=1000), [r["name"] for r in self.records])
+        self.assertEqual(map_vector(FlxBuilder.fromValue([]), processes=2), [])
+        self.assertRaises(Exception, map_vector, FlxBuilder.fromValue({"a": 1}), processes=2)
+        blobs = [{"data": bytes([i]) * 3} for i in range(100)]
+        self.assertEqual(map_vector(memoryview(FlxBuilder.fromValue(blobs)), processes=2, chunk_size=30), blobs)
+
+    def test_map_vector_file(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, FlxBuilder.fromValue(self.records))
+            os.close(fd)
+            with multiprocessing.Pool(2) as pool:
+                self.assertEqual(map_vector(path, _name, chunk_size=100, pool=pool), [r["name"] for r in self.records])
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
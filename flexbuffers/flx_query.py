@@ -0,0 +1,106 @@
+import re
+from .flx_decoder import (_CONTAINERS, _MAP, _element, _length, _lookup, decode)
+from .flx_value import FlxValue
+
+
+_STEP = re.compile(r'\.?([^.\[\]]+)|\[(\*|-?\d+)\]')
+
+
+class FlxQuery:
+    def __init__(self, paths):
+        self.paths = tuple(paths)
+        self._root = _Node()
+        for slot, path in enumerate(self.paths):
+            node = self._root
+            node.slots.append(slot)
+            for step in _parse(path):
+                node = node.child(step)
+                node.slots.append(slot)
+            node.outputs.append(slot)
+
+    def to_dict(self, source):
+        results = self._run(source)
+        return {path: results.get(slot) for slot, path in enumerate(self.paths)}
+
+    def to_tuple(self, source):
+        results = self._run(source)
+        return tuple(results.get(slot) for slot in range(len(self.paths)))
+
+    def _run(self, source):
+        if not isinstance(source, FlxValue):
+            source = FlxValue.from_bytes(source)
+        results = {}
+        _evaluate(self._root, source._buffer, source._offset, source._parent_width, source._packed_type(), results)
+        return results
+
+
+class _Node:
+    __slots__ = ('slots', 'outputs', 'keys', 'indexes', 'wildcard')
+
+    def __init__(self):
+        self.slots = []
+        self.outputs = []
+        self.keys = {}
+        self.indexes = {}
+        self.wildcard = None
+
+    def child(self, step):
+        if step is None:
+            if self.wildcard is None:
+                self.wildcard = _Node()
+            return self.wildcard
+        children = self.keys if isinstance(step, bytes) else self.indexes
+        node = children.get(step)
+        if node is None:
+            node = children[step] = _Node()
+        return node
+
+
+def _parse(path):
+    steps = []
+    position = 0
+    while position < len(path):
+        match = _STEP.match(path, position)
+        if match is None or (match.group(0)[0] == '.' and position == 0):
+            raise Exception("Bad path " + repr(path))
+        key, index = match.groups()
+        if key is not None:
+            steps.append(bytes(key, 'utf-8'))
+        elif index == '*':
+            steps.append(None)
+        else:
+            steps.append(int(index))
+        position = match.end()
+    return steps
+
+
+def _evaluate(node, buffer, offset, parent_width, packed_type, results):
+    for slot in node.outputs:
+        results[slot] = decode(buffer, offset, parent_width, packed_type)
+    kind = _CONTAINERS[packed_type]
+    if kind is None:
+        return
+    for key, child in node.keys.items():
+        element = _lookup(buffer, offset, parent_width, packed_type, key) if kind == _MAP else None
+        if element is not None:
+            _evaluate(child, buffer, element[0], element[1], element[2], results)
+    if node.indexes or node.wildcard is not None:
+        if kind == _MAP:
+            return
+        length = _length(buffer, offset, parent_width, packed_type)
+        for index, child in node.indexes.items():
+            if index < 0:
+                index += length
+            if 0 <= index < length:
+                element = _element(buffer, offset, parent_width, packed_type, index, length)
+                _evaluate(child, buffer, element[0], element[1], element[2], results)
+        child = node.wildcard
+        if child is not None:
+            fan_out = {slot: [] for slot in child.slots}
+            for index in range(length):
+                element = _element(buffer, offset, parent_width, packed_type, index, length)
+                element_results = {}
+                _evaluate(child, buffer, element[0], element[1], element[2], element_results)
+                for slot, values in fan_out.items():
+                    values.append(element_results.get(slot))
+            results.update(fan_out)
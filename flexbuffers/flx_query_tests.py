@@ -0,0 +1,46 @@
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_query import (FlxQuery)
+from .flx_value import (FlxValue)
+
+
+class MyTestCase(unittest.TestCase):
+    value = {
+        "user": {"id": 7, "name": "Max", "names": ["Max", "Maxim"]},
+        "items": [{"price": 1.5, "qty": 1}, {"price": 2.5}, {"qty": 3}],
+        "meta": {"tags": ["a", "b"], "pos": [1, 2, 3], "grid": [[1, 2], [3, 4, 5]]},
+    }
+
+    def test_paths(self):
+        query = FlxQuery(["user.id", "user.name", "items[*].price", "items[*].qty", "meta.tags[0]", "meta.tags[-1]",
+                          "meta.pos[2]", "meta.grid[*][1]", "user"])
+        self.assertEqual(query.to_dict(FlxBuilder.fromValue(self.value)), {
+            "user.id": 7,
+            "user.name": "Max",
+            "items[*].price": [1.5, 2.5, None],
+            "items[*].qty": [1, None, 3],
+            "meta.tags[0]": "a",
+            "meta.tags[-1]": "b",
+            "meta.pos[2]": 3,
+            "meta.grid[*][1]": [2, 4],
+            "user": {"id": 7, "name": "Max", "names": ["Max", "Maxim"]},
+        })
+
+    def test_missing(self):
+        query = FlxQuery(["user.age", "user.nam", "meta.tags[5]", "user[0]", "user.id.x", "nothing[*].x"])
+        self.assertEqual(query.to_tuple(FlxBuilder.fromValue(self.value)), (None, None, None, None, None, None))
+
+    def test_reuse(self):
+        query = FlxQuery(["id", "[0]"])
+        for i in range(10):
+            self.assertEqual(query.to_tuple(FlxBuilder.fromValue({"id": i})), (i, None))
+            self.assertEqual(query.to_tuple(FlxValue.from_bytes(FlxBuilder.fromValue([i]))), (None, i))
+
+    def test_bad_path(self):
+        self.assertRaises(Exception, FlxQuery, ["user..id"])
+        self.assertRaises(Exception, FlxQuery, [".user"])
+        self.assertRaises(Exception, FlxQuery, ["user[x]"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
+import collections.abc
+import dataclasses
 import json
+import typing
 import unittest
 
 from flexbuffers.flx_builder import FlxBuilder
@@ -12,6 +15,74 @@ class Person:
         self.weight = 73.1
 
 
+@dataclasses.dataclass
+class Point:
+    y: float
+    x: float
+    label: str = "p"
+
+
+class Address(typing.NamedTuple):
+    zip: int
+    city: str
+
+
+class SlottedBase:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class Slotted(SlottedBase):
+    __slots__ = ('age', '__secret', 'address')
+
+    def __init__(self, name, age, address=None):
+        super().__init__(name)
+        self.age = age
+        self.__secret = "s"
+        if address is not None:
+            self.address = address
+
+
+class FrozenDict(collections.abc.Mapping):
+    __slots__ = ('_d',)
+
+    def __init__(self, d):
+        self._d = dict(d)
+
+    def __getitem__(self, key):
+        return self._d[key]
+
+    def __iter__(self):
+        return iter(self._d)
+
+    def __len__(self):
+        return len(self._d)
+
+
+class SlottedList(collections.abc.Sequence):
+    __slots__ = ('_items',)
+
+    def __init__(self, items):
+        self._items = list(items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Empty(typing.NamedTuple):
+    pass
+
+
+class Account(typing.NamedTuple):
+    user: str
+    password: str
+
+
 class MyTestCase(unittest.TestCase):
     def test_dict(self):
         obj = {
@@ -47,6 +118,64 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(flx.weight.value(), 73.1)
         self.assertEqual(flx.name.value(), "Max")
 
+    def test_key_lookup(self):
+        value = {k: i for i, k in enumerate(["", "a", "ab", "abc", "b", "ba", "z", "ü", "😱"])}
+        for key_cache in [False, True]:
+            flx = FlxValue.from_bytes(FlxBuilder.fromValue(value), key_cache=key_cache)
+            for k, v in value.items():
+                self.assertEqual(flx[k].value(), v)
+            for k in ["aa", "abcd", "c", "zz", "ä", " "]:
+                self.assertIsNone(flx[k])
+
+    def test_key_cache(self):
+        value = [{"id": i, "name": str(i), "tags": {"id": i}} for i in range(10)]
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(value), key_cache=True)
+        for i in range(10):
+            self.assertEqual(flx[i].id.value(), i)
+            self.assertEqual(flx[i].name.value(), str(i))
+            self.assertIsNone(flx[i].other)
+        self.assertEqual(len(flx._key_cache), 1)
+        self.assertEqual(flx[3].tags.id.value(), 3)
+        self.assertEqual(len(flx._key_cache), 2)
+
+    def test_dataclass(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue([Point(1.5, 2.5), Point(0.5, 1.0, "q")]))
+        self.assertEqual(flx.to_object(), [{"label": "p", "x": 2.5, "y": 1.5}, {"label": "q", "x": 1.0, "y": 0.5}])
+
+    def test_named_tuple(self):
+        buffer = FlxBuilder.fromValue({"address": Address(12345, "Bla")})
+        self.assertEqual(buffer, FlxBuilder.fromValue({"address": {"zip": 12345, "city": "Bla"}}))
+
+    def test_empty_named_tuple(self):
+        self.assertEqual(FlxValue.from_bytes(FlxBuilder.fromValue([Empty()])).to_object(), [{}])
+
+    def test_slots(self):
+        value = Slotted("Max", 38, Address(1, "X"))
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(value))
+        self.assertEqual(flx.to_object(), {"__secret": "s", "address": {"city": "X", "zip": 1},
+                                           "age": 38, "name": "Max"})
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(Slotted("Max", 38)))
+        self.assertEqual(flx.to_object(), {"__secret": "s", "age": 38, "name": "Max"})
+        unset = Slotted("Max", 38)
+        self.assertEqual(FlxBuilder.fromValue(unset, estimate=True), FlxBuilder.fromValue(unset))
+        self.assertGreater(FlxBuilder.estimateSize(Address(1, "X")), FlxBuilder.estimateSize({}))
+
+    def test_slotted_mapping_and_sequence(self):
+        value = FrozenDict({"x": 1, "items": SlottedList([1, "a"])})
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(value))
+        self.assertEqual(flx.to_object(), {"x": 1, "items": [1, "a"]})
+
+    def test_registered_class(self):
+        FlxBuilder.registerClass(Account, exclude=["password"])
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(Account("max", "secret")))
+        self.assertEqual(flx.to_object(), {"user": "max"})
+        self.assertRaises(Exception, FlxBuilder.registerClass, Person)
+        FlxBuilder.registerClass(Address, include=[])
+        try:
+            self.assertEqual(FlxValue.from_bytes(FlxBuilder.fromValue(Address(1, "X"))).to_object(), {})
+        finally:
+            FlxBuilder.registerClass(Address)
+
     def test_json(self):
         p_string = '''{
             "age": 38,
@@ -0,0 +1,149 @@
+import functools
+import time
+from .flx_builder import (FlxBuilder, _width)
+from .flx_value import FlxValue
+
+
+_COUNTERS = (
+    "buffer_grows", "buffer_bytes_grown",
+    "string_cache_hits", "string_cache_misses",
+    "key_cache_hits", "key_cache_misses",
+    "key_vector_cache_hits", "key_vector_cache_misses",
+    "vectors_widened_16", "vectors_widened_32", "vectors_widened_64",
+    "values_created", "offset_validations", "key_lookups", "key_probes",
+)
+
+_WIDENED_COUNTERS = (None, "vectors_widened_16", "vectors_widened_32", "vectors_widened_64")
+
+_counters = dict.fromkeys(_COUNTERS, 0)
+_originals = {}
+_timer = None
+
+
+def enable(timer=None):
+    global _timer
+    _timer = timer
+    if _originals:
+        return
+    _patch(FlxBuilder, "_grow", _grow)
+    _patch(FlxBuilder, "_addString", _cached("_addString", "string_cache"))
+    _patch(FlxBuilder, "_addKey", _cached("_addKey", "key_cache"))
+    _patch(FlxBuilder, "_endMap", _cached("_endMap", "key_vector_cache"))
+    _patch(FlxBuilder, "_createVector", _createVector)
+    _patch(FlxBuilder, "_addScalarShaped", _addScalarShaped)
+    _patch(FlxBuilder, "fromValue", staticmethod(_timed("fromValue", FlxBuilder.fromValue)))
+    _patch(FlxBuilder, "finish", _timed("finish", FlxBuilder.finish))
+    _patch(FlxValue, "__init__", _init)
+    _patch(FlxValue, "_validate_offset", _validate_offset)
+    _patch(FlxValue, "key_index", _key_index)
+    _patch(FlxValue, "_dif_keys", _dif_keys)
+    _patch(FlxValue, "to_object", _timed("to_object", FlxValue.to_object))
+    _patch(FlxValue, "json", _timed("json", FlxValue.json))
+    _patch(FlxValue, "write_json", _timed("write_json", FlxValue.write_json))
+
+
+def disable():
+    global _timer
+    _timer = None
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def snapshot():
+    return dict(_counters)
+
+
+def reset():
+    for name in _COUNTERS:
+        _counters[name] = 0
+
+
+def _patch(cls, name, replacement):
+    original = cls.__dict__[name]
+    _originals[(cls, name)] = original
+    if not isinstance(replacement, staticmethod):
+        replacement = functools.wraps(original)(replacement)
+    setattr(cls, name, replacement)
+
+
+def _original(cls, name):
+    original = _originals[(cls, name)]
+    return original.__func__ if isinstance(original, staticmethod) else original
+
+
+def _timed(name, function):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        timer = _timer
+        if timer is None:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timer(name, time.perf_counter() - start)
+    return timed
+
+
+def _grow(self, min_size):
+    size = len(self._buffer)
+    _original(FlxBuilder, "_grow")(self, min_size)
+    _counters["buffer_grows"] += 1
+    _counters["buffer_bytes_grown"] += len(self._buffer) - size
+
+
+def _cached(name, cache_name):
+    cache_attribute = "_" + cache_name
+    hits_name = cache_name + "_hits"
+    misses_name = cache_name + "_misses"
+
+    def cached(self, *args):
+        cache = getattr(self, cache_attribute)
+        if cache is None:
+            return _original(FlxBuilder, name)(self, *args)
+        hits, misses = cache.hits, cache.misses
+        result = _original(FlxBuilder, name)(self, *args)
+        _counters[hits_name] += cache.hits - hits
+        _counters[misses_name] += cache.misses - misses
+        return result
+    return cached
+
+
+def _createVector(self, start, vec_len, step, keys=None):
+    result = _original(FlxBuilder, "_createVector")(self, start, vec_len, step, keys)
+    # the length alone would fit into _width(vec_len), anything wider was forced by an element
+    if result[2] > _width(vec_len):
+        _counters[_WIDENED_COUNTERS[result[2]]] += 1
+    return result
+
+
+def _addScalarShaped(self, shape, values, keys):
+    added = _original(FlxBuilder, "_addScalarShaped")(self, shape, values, keys)
+    if added and self._stack_widths[-1] > _width(len(values)):
+        _counters[_WIDENED_COUNTERS[self._stack_widths[-1]]] += 1
+    return added
+
+
+def _init(self, buffer, offset, parent_width, packed_type):
+    _counters["values_created"] += 1
+    _original(FlxValue, "__init__")(self, buffer, offset, parent_width, packed_type)
+
+
+def _validate_offset(self, offset, width):
+    _counters["offset_validations"] += 1
+    _original(FlxValue, "_validate_offset")(self, offset, width)
+
+
+def _key_index(self, key):
+    _counters["key_lookups"] += 1
+    return _original(FlxValue, "key_index")(self, key)
+
+
+def _dif_keys(self, index, key):
+    _counters["key_probes"] += 1
+    return _original(FlxValue, "_dif_keys")(self, index, key)
@@ -0,0 +1,96 @@
+import dataclasses
+import unittest
+from . import flx_stats
+from .flx_builder import (FlxBuilder, FlxShape)
+from .flx_value import (FlxValue)
+
+
+@dataclasses.dataclass
+class Pair:
+    first: str
+    second: str
+
+
+class MyTestCase(unittest.TestCase):
+    value = [{"id": i, "name": "name", "values": [1, 2, 70000]} for i in range(10)]
+
+    def setUp(self):
+        flx_stats.reset()
+
+    def tearDown(self):
+        flx_stats.disable()
+        flx_stats.reset()
+
+    def test_disabled(self):
+        grow = FlxBuilder.__dict__["_grow"]
+        init = FlxValue.__dict__["__init__"]
+        flx_stats.enable()
+        self.assertTrue(flx_stats.is_enabled())
+        flx_stats.disable()
+        self.assertFalse(flx_stats.is_enabled())
+        self.assertIs(FlxBuilder.__dict__["_grow"], grow)
+        self.assertIs(FlxValue.__dict__["__init__"], init)
+        FlxValue.from_bytes(FlxBuilder.fromValue(self.value, size=8))[0]["id"].value()
+        self.assertEqual(set(flx_stats.snapshot().values()), {0})
+
+    def test_builder_counters(self):
+        flx_stats.enable()
+        FlxBuilder.fromValue(self.value, size=8)
+        stats = flx_stats.snapshot()
+        self.assertGreater(stats["buffer_grows"], 0)
+        self.assertGreater(stats["buffer_bytes_grown"], 0)
+        self.assertEqual(stats["string_cache_misses"], 1)
+        self.assertEqual(stats["string_cache_hits"], 9)
+        self.assertEqual(stats["key_cache_misses"], 3)
+        self.assertEqual(stats["key_cache_hits"], 27)
+        self.assertEqual(stats["key_vector_cache_misses"], 1)
+        self.assertEqual(stats["key_vector_cache_hits"], 9)
+        self.assertEqual(stats["vectors_widened_32"], 10)
+        self.assertEqual(stats["vectors_widened_64"], 0)
+
+    def test_widening(self):
+        flx_stats.enable()
+        FlxBuilder.fromValue([1, 2, 3])
+        self.assertEqual(set(flx_stats.snapshot()[name] for name in flx_stats._WIDENED_COUNTERS[1:]), {0})
+        FlxBuilder.fromValue([1, 2 ** 40])
+        self.assertEqual(flx_stats.snapshot()["vectors_widened_64"], 1)
+        shape = FlxShape(["a"], {"a": int})
+        builder = FlxBuilder()
+        builder.startVector()
+        for record in [{"a": 1}, {"a": 70000}, {"a": 70000}]:
+            builder.addShaped(shape, record)
+        builder.endVector()
+        self.assertEqual(flx_stats.snapshot()["vectors_widened_32"], 2)
+        flx_stats.reset()
+        builder = FlxBuilder(8)
+        builder.add(list(range(100)))
+        builder.finish()
+        self.assertEqual(flx_stats.snapshot()["buffer_bytes_grown"], len(builder._buffer) - 8)
+
+    def test_shaped_values(self):
+        flx_stats.enable()
+        FlxBuilder.fromValue([Pair("a", "b"), Pair("a", "b")])
+        stats = flx_stats.snapshot()
+        self.assertEqual(stats["string_cache_misses"], 2)
+        self.assertEqual(stats["string_cache_hits"], 2)
+
+    def test_reader_counters(self):
+        buffer = FlxBuilder.fromValue(self.value)
+        flx_stats.enable()
+        flx = FlxValue.from_bytes(buffer)
+        self.assertEqual(flx[3]["name"].value(), "name")
+        stats = flx_stats.snapshot()
+        self.assertEqual(stats["values_created"], 3)
+        self.assertEqual(stats["key_lookups"], 1)
+        self.assertGreater(stats["key_probes"], 0)
+        self.assertGreater(stats["offset_validations"], 0)
+
+    def test_timer(self):
+        events = []
+        flx_stats.enable(lambda name, seconds: events.append((name, seconds >= 0)))
+        FlxValue.from_bytes(FlxBuilder.fromValue(self.value)).to_object()
+        self.assertEqual(events, [("fromValue", True), ("to_object", True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
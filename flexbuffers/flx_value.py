@@ -1,10 +1,40 @@
+import array
+import mmap
 import struct
-import base64
-import json
+import sys
+from .flx_cursor import (FlxCursor, visit)
+from .flx_decoder import (_FLOAT_UNPACKERS, _INT_UNPACKERS, _UINT_UNPACKERS, _terminator, decode)
+from .flx_json import (iter_json, write_json)
+from .flx_views import _view
 from .value_types import ValueType
 
 
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+_NUMERIC_FORMATS = {
+    ValueType.Int: {1: 'b', 2: 'h', 4: 'i', 8: 'q'},
+    ValueType.UInt: {1: 'B', 2: 'H', 4: 'I', 8: 'Q'},
+    ValueType.Float: {4: 'f', 8: 'd'},
+    ValueType.Bool: {1: '?', 2: 'H', 4: 'I', 8: 'Q'},
+}
+
+_NUMPY_DTYPES = {ValueType.Int: '<i', ValueType.UInt: '<u', ValueType.Float: '<f', ValueType.Bool: '<u'}
+
+
+def _array_code(fmt):
+    if fmt == '?':
+        return 'B'
+    size = struct.calcsize(fmt)
+    for code in ('bhilq' if fmt.islower() else 'BHILQ') if fmt not in 'fd' else fmt:
+        if array.array(code).itemsize == size:
+            return code
+
+
 class FlxValue:
+    # every slot is assigned in __init__, otherwise reading it would end up in __getattr__
+    __slots__ = ('_buffer', '_offset', '_parent_width', '_byte_width', '_value_type', '_len', '_indirect',
+                 '_keys_offset', '_keys_width', '_key_cache')
+
     def __init__(self, buffer, offset, parent_width, packed_type):
         self._buffer = buffer
         self._offset = offset
@@ -12,15 +42,35 @@ class FlxValue:
         self._byte_width = 1 << (packed_type & 3)
         self._value_type = ValueType(packed_type >> 2)
         self._len = None
+        self._indirect = None
+        self._keys_offset = None
+        self._keys_width = None
+        self._key_cache = None
 
     @staticmethod
-    def from_bytes(buffer):
+    def from_bytes(buffer, key_cache=False, checked=True):
         if len(buffer) < 3:
             raise Exception("Buffer needs to be bigger than 2 bytes")
         byte_width = buffer[-1]
         packed_type = buffer[-2]
         offset = len(buffer) - byte_width - 2
-        return FlxValue(buffer, offset, byte_width, packed_type)
+        flx = (FlxValue if checked else _UncheckedFlxValue)(buffer, offset, byte_width, packed_type)
+        if key_cache:
+            flx._key_cache = {}
+        return flx
+
+    @staticmethod
+    def from_mmap(buffer, key_cache=False, checked=True):
+        return FlxValue.from_bytes(buffer, key_cache, checked)
+
+    @staticmethod
+    def from_file(path, key_cache=False, checked=True):
+        return FlxFile(path, key_cache, checked)
+
+    def _child(self, offset, parent_width, packed_type):
+        flx = self.__class__(self._buffer, offset, parent_width, packed_type)
+        flx._key_cache = self._key_cache
+        return flx
 
     def is_null(self):
         return self._value_type == ValueType.Null
@@ -46,11 +96,11 @@ class FlxValue:
         if self._value_type == ValueType.String:
             size = len(self)
             indirect_offset = self._compute_indirect()
-            return self._buffer[indirect_offset:indirect_offset + size].decode("utf-8")
+            return str(self._buffer[indirect_offset:indirect_offset + size], "utf-8")
         if self._value_type == ValueType.Key:
             indirect_offset = self._compute_indirect()
             size = len(self)
-            return self._buffer[indirect_offset:indirect_offset + size].decode("utf-8")
+            return str(self._buffer[indirect_offset:indirect_offset + size], "utf-8")
         if self._value_type == ValueType.Blob:
             indirect_offset = self._compute_indirect()
             size = self._read_int(indirect_offset - self._byte_width, self._byte_width)
@@ -67,7 +117,7 @@ class FlxValue:
                 size_width = size_width << 1
                 size = self._read_int(indirect_offset - size_width, size_width)
             indirect_offset = self._compute_indirect()
-            return self._buffer[indirect_offset:indirect_offset + size].decode("utf-8")
+            return str(self._buffer[indirect_offset:indirect_offset + size], "utf-8")
         return None
 
     def num(self):
@@ -93,7 +143,7 @@ class FlxValue:
             size = 0
             while self._buffer[indirect_offset + size] != 0:
                 size = size + 1
-            return self._buffer[indirect_offset:indirect_offset + size].decode("utf-8")
+            return str(self._buffer[indirect_offset:indirect_offset + size], "utf-8")
 
     def __len__(self):
         if self._len is not None:
@@ -135,17 +185,17 @@ class FlxValue:
                 indirect_offset = self._compute_indirect()
                 elem_offset = indirect_offset + (item * self._byte_width)
                 if self._value_type.is_typed_vector():
-                    flx = FlxValue(self._buffer, elem_offset, self._byte_width, 0)
+                    flx = self._child(elem_offset, self._byte_width, 0)
                     flx._byte_width = 1
                     flx._value_type = ValueType(self._value_type.typed_vector_element_type())
                     return flx
                 if self._value_type.is_fixed_typed_vector():
-                    flx = FlxValue(self._buffer, elem_offset, self._byte_width, 0)
+                    flx = self._child(elem_offset, self._byte_width, 0)
                     flx._byte_width = 1
                     flx._value_type = ValueType(self._value_type.fixed_typed_vector_element_type())
                     return flx
                 packed_type = self._buffer[indirect_offset + length * self._byte_width + item]
-                return FlxValue(self._buffer, elem_offset, self._byte_width, packed_type)
+                return self._child(elem_offset, self._byte_width, packed_type)
         if isinstance(item, str):
             index = self.key_index(item)
             if index is None:
@@ -166,55 +216,76 @@ class FlxValue:
             return
         yield self.value()
 
-    def json(self):
-        result = ''
-        if self._value_type == ValueType.Map:
-            last_element_index = len(self) - 1
-            result += '{'
-            for i, v in enumerate(self):
-                result += v[0].json() + ":" + v[1].json()
-                if i < last_element_index:
-                    result += ","
-            result += '}'
-        elif self._value_type.is_a_vector():
-            last_element_index = len(self) - 1
-            result += '['
-            for i, v in enumerate(self):
-                result += v.json()
-                if i < last_element_index:
-                    result += ","
-            result += ']'
-        elif self._value_type == ValueType.Key or self._value_type == ValueType.String:
-            result += json.dumps(self.value(), ensure_ascii=False)
-        elif self._value_type == ValueType.Bool:
-            if self.value():
-                result += "true"
-            else:
-                result += "false"
-        elif self.is_null():
-            result += "null"
-        elif self._value_type == ValueType.Blob:
-            result += '"' + base64.b64encode(self.value()) + '"'
-        else:
-            result += str(self.value())
-        return result
+    def view(self, cache=1024):
+        return _view(self._buffer, self._offset, self._parent_width, self._packed_type(), cache)
+
+    def cursor(self):
+        return FlxCursor(self)
+
+    def visit(self, callback):
+        visit(self, callback)
+
+    def json(self, indent=None):
+        return ''.join(self.iter_json(indent))
+
+    def iter_json(self, indent=None, chunk_size=1 << 16):
+        return iter_json(self._buffer, self._offset, self._parent_width, self._packed_type(), indent, chunk_size)
+
+    def write_json(self, fp, indent=None, chunk_size=1 << 16):
+        write_json(fp, self._buffer, self._offset, self._parent_width, self._packed_type(), indent, chunk_size)
 
     def to_object(self):
-        if self._value_type == ValueType.Map:
-            result = {}
-            for k, v in self:
-                result[k.value()] = v.to_object()
-            return result
-        elif self._value_type.is_a_vector():
-            result = []
-            for v in self:
-                result.append(v.to_object())
-            return result
-        return self.value()
+        return decode(self._buffer, self._offset, self._parent_width, self._packed_type())
+
+    def to_memoryview(self):
+        element_type, width, start, length = self._numeric_layout()
+        if not _LITTLE_ENDIAN and width > 1:
+            raise Exception("Typed memoryviews are only supported on little endian platforms")
+        with memoryview(self._buffer) as view:
+            return view[start:start + length * width].cast(_NUMERIC_FORMATS[element_type][width])
+
+    def to_array(self):
+        element_type, width, start, length = self._numeric_layout()
+        result = array.array(_array_code(_NUMERIC_FORMATS[element_type][width]))
+        result.frombytes(self._buffer[start:start + length * width])
+        if not _LITTLE_ENDIAN:
+            result.byteswap()
+        return result
+
+    def to_numpy(self):
+        import numpy
+        element_type, width, start, length = self._numeric_layout()
+        dtype = '?' if element_type == ValueType.Bool and width == 1 else _NUMPY_DTYPES[element_type] + str(width)
+        return numpy.frombuffer(self._buffer, dtype=dtype, count=length, offset=start)
+
+    def _numeric_layout(self):
+        if self._value_type.is_typed_vector():
+            element_type = ValueType(self._value_type.typed_vector_element_type())
+        elif self._value_type.is_fixed_typed_vector():
+            element_type = ValueType(self._value_type.fixed_typed_vector_element_type())
+        elif self._value_type == ValueType.Vector:
+            length = len(self)
+            types_offset = self._compute_indirect() + length * self._byte_width
+            types = bytes(self._buffer[types_offset:types_offset + length])
+            if length == 0 or (types.count(types[0]) != length and
+                               any(t >> 2 != types[0] >> 2 for t in types)):
+                raise Exception("Vector elements are not all of the same type")
+            element_type = ValueType(types[0] >> 2)
+        else:
+            raise Exception("Value is not a vector")
+        if element_type not in _NUMERIC_FORMATS or self._byte_width not in _NUMERIC_FORMATS[element_type]:
+            raise Exception("Vector elements are not numbers")
+        return element_type, self._byte_width, self._compute_indirect(), len(self)
 
     def key_index(self, key):
         if self._value_type is not ValueType.Map:
             return None
+        if self._key_cache is not None:
+            keys_offset = self._keys()[0]
+            indices = self._key_cache.get(keys_offset)
+            if indices is None:
+                indices = self._key_cache[keys_offset] = self._key_indices()
+            return indices.get(key)
         utf8_key = bytes(key, 'utf-8')
         low = 0
         high = len(self) - 1
@@ -230,71 +301,121 @@ class FlxValue:
         return None
 
     def _dif_keys(self, index, key):
-        key2 = self._get_key_for_index(index)
-        indirect_offset = key2._compute_indirect()
+        start = self._key_start(index)
         key_len = len(key)
-        for i in range(key_len):
-            dif = key[i] - self._buffer[indirect_offset + i]
-            if dif != 0:
-                return dif
-
-        if key2._buffer[indirect_offset + key_len] == 0:
+        stored = bytes(self._buffer[start:start + key_len])
+        if key < stored:
+            return -1
+        if key > stored:
+            return 1
+        if self._buffer[start + key_len] == 0:
             return 0
         return -1
 
+    def _key_start(self, index):
+        keys_offset, byte_width = self._keys()
+        elem_offset = keys_offset + index * byte_width
+        return elem_offset - self._read_int(elem_offset, byte_width)
+
+    def _key_indices(self):
+        buffer = self._buffer
+        indices = {}
+        for i in range(len(self)):
+            start = self._key_start(i)
+            end = _terminator(buffer, start, len(buffer))
+            if end < 0:
+                raise Exception("Key is not terminated")
+            indices[str(buffer[start:end], 'utf-8')] = i
+        return indices
+
     def _get_key_for_index(self, index):
         if self._value_type != ValueType.Map:
             return None
-        offset = self._compute_indirect()
-        keys_offset = offset - self._byte_width * 3
-        indirect_offset = keys_offset - self._read_int(keys_offset, self._byte_width)
-        byte_width = self._read_int(keys_offset + self._byte_width, self._byte_width)
+        indirect_offset, byte_width = self._keys()
         elem_offset = indirect_offset + index * byte_width
-        flx = FlxValue(self._buffer, elem_offset, byte_width, 0)
+        flx = self._child(elem_offset, byte_width, 0)
         flx._byte_width = byte_width
         flx._value_type = ValueType.Key
         return flx
 
+    def _keys(self):
+        if self._keys_offset is None:
+            keys_offset = self._compute_indirect() - self._byte_width * 3
+            self._keys_offset = keys_offset - self._read_int(keys_offset, self._byte_width)
+            self._keys_width = self._read_int(keys_offset + self._byte_width, self._byte_width)
+        return self._keys_offset, self._keys_width
+
     def _get_value_for_index(self, index):
         if self._value_type != ValueType.Map:
             return None
         indirect_offset = self._compute_indirect()
         elem_offset = indirect_offset + (index * self._byte_width)
         packed_type = self._buffer[indirect_offset + len(self) * self._byte_width + index]
-        return FlxValue(self._buffer, elem_offset, self._byte_width, packed_type)
+        return self._child(elem_offset, self._byte_width, packed_type)
 
     def _read_int(self, offset, width):
         self._validate_offset(offset, width)
-        if width == 1:
-            return struct.unpack_from("<b", self._buffer, offset)[0]
-        if width == 2:
-            return struct.unpack_from("<h", self._buffer, offset)[0]
-        if width == 4:
-            return struct.unpack_from("<i", self._buffer, offset)[0]
-        return struct.unpack_from("<q", self._buffer, offset)[0]
+        return _INT_UNPACKERS[width](self._buffer, offset)[0]
 
     def _read_uint(self, offset, width):
         self._validate_offset(offset, width)
-        if width == 1:
-            return struct.unpack_from("<B", self._buffer, offset)[0]
-        if width == 2:
-            return struct.unpack_from("<H", self._buffer, offset)[0]
-        if width == 4:
-            return struct.unpack_from("<I", self._buffer, offset)[0]
-        return struct.unpack_from("<Q", self._buffer, offset)[0]
+        return _UINT_UNPACKERS[width](self._buffer, offset)[0]
 
     def _read_float(self, offset, width):
         self._validate_offset(offset, width)
         if width != 4 and width != 8:
-            raise Exception("Bad width " + width)
-        if width == 4:
-            return struct.unpack_from("<f", self._buffer, offset)[0]
-        return struct.unpack_from("<d", self._buffer, offset)[0]
+            raise Exception("Bad width " + str(width))
+        return _FLOAT_UNPACKERS[width](self._buffer, offset)[0]
+
+    def _packed_type(self):
+        return (self._value_type << 2) | (self._byte_width.bit_length() - 1)
 
     def _compute_indirect(self):
-        step = self._read_int(self._offset, self._parent_width)
-        return self._offset - step
+        indirect = self._indirect
+        if indirect is None:
+            indirect = self._indirect = self._offset - self._read_int(self._offset, self._parent_width)
+        return indirect
 
     def _validate_offset(self, offset, width):
-        if self._offset < 0 or len(self._buffer) <= (offset + width) or (offset & (width - 1)) != 0:
+        if offset < 0 or len(self._buffer) <= (offset + width) or (offset & (width - 1)) != 0:
             raise Exception("Bad offset")
+
+
+class _UncheckedFlxValue(FlxValue):
+    __slots__ = ()
+
+    def _read_int(self, offset, width):
+        return _INT_UNPACKERS[width](self._buffer, offset)[0]
+
+    def _read_uint(self, offset, width):
+        return _UINT_UNPACKERS[width](self._buffer, offset)[0]
+
+    def _read_float(self, offset, width):
+        if width != 4 and width != 8:
+            raise Exception("Bad width " + str(width))
+        return _FLOAT_UNPACKERS[width](self._buffer, offset)[0]
+
+
+class FlxFile:
+    __slots__ = ('_mmap', 'root')
+
+    def __init__(self, path, key_cache=False, checked=True):
+        with open(path, 'rb') as file:
+            size = file.seek(0, 2)
+            if size < 3:
+                raise Exception("Buffer needs to be bigger than 2 bytes")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.root = FlxValue.from_mmap(self._mmap, key_cache, checked)
+
+    @property
+    def closed(self):
+        return self._mmap.closed
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self.root
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,4 +1,9 @@
+import array
+import mmap
+import os
+import tempfile
 import unittest
+from .flx_builder import FlxBuilder
 from .flx_value import (FlxValue)
 
 
@@ -210,6 +215,15 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(flx["a"].value(), 12)
         self.assertEqual(flx[""].value(), 45)
 
+    def test_memoryview_map(self):
+        buffer = memoryview(FlxBuilder.fromValue({"n": 1, "name": "abc", "": 2}))
+        for key_cache in [False, True]:
+            flx = FlxValue.from_bytes(buffer, key_cache)
+            self.assertEqual(flx["n"].value(), 1)
+            self.assertEqual(flx["name"].value(), "abc")
+            self.assertEqual(flx[""].value(), 2)
+            self.assertIsNone(flx["na"])
+
     def test_complex_map(self):
         flx = self._complex_map()
         # {
@@ -308,6 +322,84 @@ class MyTestCase(unittest.TestCase):
         ])).json(), '{"":45,"a":12}')
         self.assertEqual(self._complex_map().json(), '{"address":{"city":"Bla","countryCode":"XX","zip":"12345"},"age":35,"flags":[true,false,true,true],"name":"Maxim","weight":72.5}')
 
+    def test_resolved_offsets_are_cached(self):
+        flx = self._complex_map()
+        self.assertIsNone(flx._indirect)
+        address = flx.address
+        self.assertEqual(flx._indirect, 112)
+        self.assertIsNotNone(flx._keys_offset)
+        self.assertEqual(address.city.value(), "Bla")
+        self.assertEqual(address.zip.value(), "12345")
+        self.assertEqual(len(address), 3)
+        self.assertNotIn('__dict__', dir(FlxValue))
+
+    def test_bad_offset(self):
+        self.assertRaises(Exception, FlxValue.from_bytes(bytes([5, 20, 1])).value)
+
+    def test_typed_vector_export(self):
+        flx = FlxValue.from_bytes(bytes(
+            [3, 0, 0, 0, 0, 0, 0, 0, 154, 153, 153, 153, 153, 153, 241, 63, 154, 153, 153, 153, 153, 153, 1, 64, 102,
+             102, 102, 102, 102, 102, 10, 64, 24, 55, 1]))
+        self.assertEqual(flx.to_memoryview().tolist(), [1.1, 2.2, 3.3])
+        self.assertEqual(flx.to_memoryview().format, 'd')
+        self.assertEqual(flx.to_array(), array.array('d', [1.1, 2.2, 3.3]))
+        flx = FlxValue.from_bytes(bytes([3, 0, 1, 0, 43, 2, 3, 0, 6, 45, 1]))
+        self.assertEqual(flx.to_memoryview().tolist(), [1, 555, 3])
+        self.assertEqual(flx.to_array().typecode, 'h')
+        flx = FlxValue.from_bytes(bytes([45, 0, 0, 0, 0, 0, 0, 0, 255, 255, 255, 255, 255, 255, 255, 255, 16, 71, 1]))
+        self.assertEqual(flx.to_array().tolist(), [45, 18446744073709551615])
+        flx = FlxValue.from_bytes(bytes([3, 1, 0, 1, 3, 144, 1]))
+        self.assertEqual(flx.to_memoryview().tolist(), [True, False, True])
+
+    def test_untyped_vector_export(self):
+        self.assertEqual(FlxValue.from_bytes(bytes([2, 1, 2, 4, 5, 4, 40, 1])).to_array().tolist(), [1, 2])
+        self.assertRaises(Exception, FlxValue.from_bytes(bytes([2, 1, 2, 4, 8, 4, 40, 1])).to_array)
+        flx = FlxValue.from_bytes(memoryview(bytes([2, 1, 2, 4, 4, 4, 40, 1])))
+        self.assertEqual(flx.to_array().tolist(), [1, 2])
+        self.assertEqual(flx.to_memoryview().tolist(), [1, 2])
+        flx = FlxValue.from_bytes(bytes([3, 102, 111, 111, 0, 3, 98, 97, 114, 0, 3, 98, 97, 122, 0, 3, 15, 11, 7, 3, 60, 1]))
+        self.assertRaises(Exception, flx.to_memoryview)
+        self.assertRaises(Exception, FlxValue.from_bytes(bytes([25, 4, 1])).to_array)
+
+    def test_numpy_export(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        flx = FlxValue.from_bytes(bytes([3, 0, 0, 0, 0, 0, 192, 63, 0, 0, 32, 64, 0, 0, 96, 64, 12, 54, 1]))
+        self.assertEqual(flx.to_numpy().tolist(), [1.5, 2.5, 3.5])
+        self.assertEqual(flx.to_numpy().dtype, numpy.dtype('<f4'))
+
+    def test_from_file(self):
+        value = {"name": "Maxim", "ids": [1, 2, 3], "pos": [1.5, 2.5], "data": b"\x01\x02", "nested": [{"a": None}]}
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, FlxBuilder.fromValue(value))
+            os.close(fd)
+            with FlxValue.from_file(path) as flx:
+                self.assertEqual(flx["name"].value(), "Maxim")
+                self.assertEqual(flx.ids[2].value(), 3)
+                self.assertEqual(flx["data"].value(), b"\x01\x02")
+                self.assertEqual(flx["pos"].to_array(), array.array('d', [1.5, 2.5]))
+                self.assertEqual(flx.to_object(), value)
+            snapshot = FlxValue.from_file(path, key_cache=True)
+            self.assertEqual(snapshot.root["nested"][0]["a"].value(), None)
+            self.assertFalse(snapshot.closed)
+            snapshot.close()
+            self.assertTrue(snapshot.closed)
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self.assertEqual(FlxValue.from_mmap(buffer)["name"].value(), "Maxim")
+        finally:
+            os.remove(path)
+
+    def test_from_empty_file(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertRaises(Exception, FlxValue.from_file, path)
+        finally:
+            os.remove(path)
+
     def _checkVector(self, _bytes, values):
         flx = FlxValue.from_bytes(_bytes)
         self.assertEqual(len(flx), len(values))
@@ -0,0 +1,159 @@
+from .flx_decoder import (_INT_UNPACKERS, _terminator)
+from .value_types import ValueType
+
+
+_VALUE_TYPES = {int(t): t for t in ValueType}
+
+
+def verify(buffer, max_depth=64):
+    _Verifier(buffer, max_depth).verify()
+
+
+def is_valid(buffer, max_depth=64):
+    try:
+        verify(buffer, max_depth)
+    except Exception:
+        return False
+    return True
+
+
+class _Verifier:
+    __slots__ = ('buffer', 'end', 'max_depth', 'visited')
+
+    def __init__(self, buffer, max_depth):
+        self.buffer = buffer
+        self.end = len(buffer) - 2
+        self.max_depth = max_depth
+        self.visited = {}
+
+    def verify(self):
+        if len(self.buffer) < 3:
+            raise Exception("Buffer needs to be bigger than 2 bytes")
+        byte_width = self.buffer[-1]
+        if byte_width not in _INT_UNPACKERS:
+            raise Exception("Bad root width " + str(byte_width))
+        stack = [(len(self.buffer) - byte_width - 2, byte_width, self.buffer[-2], 1)]
+        while stack:
+            offset, parent_width, packed_type, depth = stack.pop()
+            self._value(offset, parent_width, packed_type, depth, stack)
+
+    def _value(self, offset, parent_width, packed_type, depth, stack):
+        value_type = _VALUE_TYPES.get(packed_type >> 2)
+        if value_type is None:
+            raise Exception("Bad type " + str(packed_type >> 2) + " at " + str(offset))
+        byte_width = 1 << (packed_type & 3)
+        self._check(offset, parent_width)
+        if value_type == ValueType.Float and parent_width < 4:
+            raise Exception("Bad float width " + str(parent_width) + " at " + str(offset))
+        if value_type.is_inline():
+            return
+        target = self._indirect(offset, parent_width)
+        if value_type == ValueType.Key:
+            self._key(target)
+        elif value_type == ValueType.String:
+            self._string(target, byte_width)
+        elif value_type == ValueType.Blob:
+            self._check_range(target, self._size(target, byte_width))
+        elif value_type == ValueType.IndirectInt or value_type == ValueType.IndirectUInt:
+            self._check(target, byte_width)
+        elif value_type == ValueType.IndirectFloat:
+            if byte_width < 4:
+                raise Exception("Bad float width " + str(byte_width) + " at " + str(target))
+            self._check(target, byte_width)
+        else:
+            if self.visited.get((target, packed_type), depth + 1) <= depth:
+                return
+            if depth > self.max_depth:
+                raise Exception("Buffer is nested deeper than " + str(self.max_depth))
+            self.visited[(target, packed_type)] = depth
+            self._container(target, byte_width, value_type, depth, stack)
+
+    def _container(self, target, byte_width, value_type, depth, stack):
+        if value_type.is_fixed_typed_vector():
+            element_type = ValueType(value_type.fixed_typed_vector_element_type())
+            self._check(target, byte_width)
+            self._check_range(target, value_type.fixed_typed_vector_element_size() * byte_width)
+            if element_type == ValueType.Float and byte_width < 4:
+                raise Exception("Bad float width " + str(byte_width) + " at " + str(target))
+            return
+        length = self._size(target, byte_width)
+        self._check_range(target, length * byte_width)
+        if value_type.is_typed_vector():
+            element_type = ValueType(value_type.typed_vector_element_type())
+            if element_type == ValueType.Float and byte_width < 4:
+                raise Exception("Bad float width " + str(byte_width) + " at " + str(target))
+            if element_type == ValueType.Key:
+                for i in range(length):
+                    self._key(self._indirect(target + i * byte_width, byte_width))
+            elif element_type == ValueType.String:
+                for i in range(length):
+                    self._string(self._indirect(target + i * byte_width, byte_width), 1)
+            return
+        types = target + length * byte_width
+        self._check_range(types, length)
+        if value_type == ValueType.Map:
+            self._keys(target, byte_width, length)
+        for i in range(length - 1, -1, -1):
+            stack.append((target + i * byte_width, byte_width, self.buffer[types + i], depth + 1))
+
+    def _keys(self, target, byte_width, length):
+        prefix = target - byte_width * 3
+        self._check(prefix, byte_width)
+        keys = self._indirect(prefix, byte_width)
+        keys_width = self._read(prefix + byte_width, byte_width)
+        if keys_width not in _INT_UNPACKERS:
+            raise Exception("Bad keys width " + str(keys_width) + " at " + str(prefix))
+        if self._size(keys, keys_width) != length:
+            raise Exception("Keys vector at " + str(keys) + " does not match map length")
+        if (keys, -keys_width) in self.visited:
+            return
+        self.visited[(keys, -keys_width)] = 0
+        self._check_range(keys, length * keys_width)
+        previous = None
+        for i in range(length):
+            start = self._indirect(keys + i * keys_width, keys_width)
+            key = bytes(self.buffer[start:self._key(start)])
+            if previous is not None and previous >= key:
+                raise Exception("Keys of map at " + str(target) + " are not sorted")
+            previous = key
+
+    def _string(self, target, byte_width):
+        # strings in typed vectors are read with width 1, the size prefix can be wider
+        while True:
+            size = self._size(target, byte_width)
+            self._check_range(target, size + 1)
+            if self.buffer[target + size] == 0:
+                return
+            if byte_width == 8:
+                raise Exception("String at " + str(target) + " is not terminated")
+            byte_width <<= 1
+
+    def _key(self, target):
+        end = _terminator(self.buffer, target, self.end)
+        if end < 0:
+            raise Exception("Key at " + str(target) + " is not terminated")
+        return end
+
+    def _size(self, target, byte_width):
+        size = self._read(target - byte_width, byte_width)
+        if size < 0:
+            raise Exception("Bad size " + str(size) + " at " + str(target - byte_width))
+        return size
+
+    def _indirect(self, offset, width):
+        target = offset - self._read(offset, width)
+        if target < 0 or target >= self.end:
+            raise Exception("Bad offset at " + str(offset))
+        return target
+
+    def _read(self, offset, width):
+        self._check(offset, width)
+        return _INT_UNPACKERS[width](self.buffer, offset)[0]
+
+    def _check(self, offset, width):
+        if offset < 0 or offset + width > self.end or (offset & (width - 1)) != 0:
+            raise Exception("Bad offset " + str(offset) + " for width " + str(width))
+
+    def _check_range(self, offset, size):
+        if offset < 0 or size < 0 or offset + size > self.end:
+            raise Exception("Bad range " + str(offset) + " - " + str(offset + size))
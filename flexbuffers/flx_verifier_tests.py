@@ -0,0 +1,76 @@
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_value import (FlxValue)
+from .flx_verifier import (verify, is_valid)
+
+
+class MyTestCase(unittest.TestCase):
+    value = {
+        "name": "Maxim",
+        "age": 38,
+        "weight": 72.5,
+        "big": 2 ** 40,
+        "data": b"\x01\x02",
+        "flags": [True, False],
+        "ids": [1, 2, 300],
+        "pos": [1.5, 2.5, 3.5],
+        "tags": ["a", "b"],
+        "mixed": [None, "x", {}, [], {"x": -1}],
+    }
+
+    def test_valid(self):
+        for value in [None, True, 1, 2.5, "hello", b"blob", [], {}, self.value, [self.value] * 10]:
+            verify(FlxBuilder.fromValue(value))
+            verify(memoryview(FlxBuilder.fromValue(value)))
+        verify(bytes([102, 111, 111, 0, 98, 97, 114, 0, 2, 9, 6, 2, 56, 1]))
+
+    def test_long_strings_in_string_vector(self):
+        for size in [127, 128, 200, 255, 256, 70000]:
+            buffer = FlxBuilder.fromValue(["x" * size, "a"])
+            verify(buffer)
+            self.assertEqual(FlxValue.from_bytes(buffer).to_object(), ["x" * size, "a"])
+
+    def test_bad_buffers(self):
+        self.assertFalse(is_valid(bytes([0, 0])))
+        self.assertFalse(is_valid(bytes([0, 0, 3])))
+        # offset points outside of the buffer
+        self.assertFalse(is_valid(bytes([3, 102, 111, 0, 120, 20, 1])))
+        # string is not terminated
+        self.assertFalse(is_valid(bytes([3, 102, 111, 111, 1, 20, 1])))
+        # string size is bigger than the buffer
+        self.assertFalse(is_valid(bytes([9, 102, 111, 111, 0, 4, 20, 1])))
+        # float with a width of one byte
+        self.assertFalse(is_valid(bytes([1, 12, 1])))
+        # unknown type
+        self.assertFalse(is_valid(bytes([1, 200, 1])))
+        # keys are not sorted
+        self.assertFalse(is_valid(bytes([98, 0, 97, 0, 2, 5, 4, 2, 1, 2, 1, 2, 4, 4, 4, 36, 1])))
+
+    def test_bad_keys_vector(self):
+        buffer = bytearray(FlxBuilder.fromValue({"a": 1, "b": 2}))
+        verify(bytes(buffer))
+        buffer[4] = 3
+        self.assertFalse(is_valid(bytes(buffer)))
+
+    def test_max_depth(self):
+        value = []
+        for _ in range(10):
+            value = [value]
+        buffer = FlxBuilder.fromValue(value)
+        verify(buffer, max_depth=11)
+        self.assertRaises(Exception, verify, buffer, 10)
+
+    def test_unchecked(self):
+        buffer = FlxBuilder.fromValue(self.value)
+        verify(buffer)
+        flx = FlxValue.from_bytes(buffer, checked=False)
+        self.assertEqual(flx["name"].value(), "Maxim")
+        self.assertEqual(flx["big"].value(), 2 ** 40)
+        self.assertEqual(flx["weight"].value(), 72.5)
+        self.assertEqual(flx["mixed"][4]["x"].value(), -1)
+        self.assertIs(type(flx["mixed"][4]), type(flx))
+        self.assertEqual(flx.to_object(), self.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import collections.abc
+from .flx_builder import _dedup_cache
+from .flx_decoder import (_CONTAINERS, _INT_UNPACKERS, _MAP, _READERS, _element, _indirect, _key, _length, _lookup)
+from .value_types import ValueType
+
+
+_INLINE_TYPES = frozenset(t for t in ValueType if t.is_inline())
+
+
+def view(buffer, cache=1024):
+    if len(buffer) < 3:
+        raise Exception("Buffer needs to be bigger than 2 bytes")
+    byte_width = buffer[-1]
+    return _view(buffer, len(buffer) - byte_width - 2, byte_width, buffer[-2], cache)
+
+
+def _view(buffer, offset, parent_width, packed_type, cache):
+    return _child(_Document(buffer, _dedup_cache(cache)), offset, parent_width, packed_type)
+
+
+class _Document:
+    __slots__ = ('buffer', 'cache')
+
+    def __init__(self, buffer, cache):
+        self.buffer = buffer
+        self.cache = cache
+
+
+def _child(document, offset, parent_width, packed_type):
+    reader = _READERS[packed_type]
+    if reader is not None and (packed_type >> 2) in _INLINE_TYPES:
+        return reader(document.buffer, offset, parent_width)
+    cache = document.cache
+    if cache is not None:
+        value = cache.get(offset)
+        if value is not None:
+            return value
+    if reader is not None:
+        value = reader(document.buffer, offset, parent_width)
+    elif _CONTAINERS[packed_type] == _MAP:
+        value = FlxMapView(document, offset, parent_width, packed_type)
+    else:
+        value = FlxSequenceView(document, offset, parent_width, packed_type)
+    if cache is not None:
+        cache.put(offset, value)
+    return value
+
+
+class FlxSequenceView(collections.abc.Sequence):
+    __slots__ = ('_document', '_offset', '_parent_width', '_packed_type', '_length')
+
+    def __init__(self, document, offset, parent_width, packed_type):
+        self._document = document
+        self._offset = offset
+        self._parent_width = parent_width
+        self._packed_type = packed_type
+        self._length = _length(document.buffer, offset, parent_width, packed_type)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("Index out of range")
+        element = _element(self._document.buffer, self._offset, self._parent_width, self._packed_type, index,
+                           self._length)
+        return _child(self._document, *element)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, FlxSequenceView)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FlxSequenceView(' + repr(list(self)) + ')'
+
+
+class FlxMapView(collections.abc.Mapping):
+    __slots__ = ('_document', '_offset', '_parent_width', '_packed_type', '_length', '_keys')
+
+    def __init__(self, document, offset, parent_width, packed_type):
+        self._document = document
+        self._offset = offset
+        self._parent_width = parent_width
+        self._packed_type = packed_type
+        self._length = _length(document.buffer, offset, parent_width, packed_type)
+        self._keys = None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        element = self._lookup(key)
+        if element is None:
+            raise KeyError(key)
+        return _child(self._document, *element)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __iter__(self):
+        if self._keys is None:
+            self._keys = self._key_list()
+        return iter(self._keys)
+
+    def __repr__(self):
+        return 'FlxMapView(' + repr(dict(self)) + ')'
+
+    def _lookup(self, key):
+        if not isinstance(key, str):
+            return None
+        return _lookup(self._document.buffer, self._offset, self._parent_width, self._packed_type,
+                       bytes(key, 'utf-8'))
+
+    def _key_list(self):
+        buffer = self._document.buffer
+        byte_width = 1 << (self._packed_type & 3)
+        keys_offset = _indirect(buffer, self._offset, self._parent_width) - byte_width * 3
+        keys_start = _indirect(buffer, keys_offset, byte_width)
+        keys_width = _INT_UNPACKERS[byte_width](buffer, keys_offset + byte_width)[0]
+        return [_key(buffer, keys_start + i * keys_width, keys_width) for i in range(self._length)]
@@ -0,0 +1,61 @@
+import collections.abc
+import unittest
+from .flx_builder import FlxBuilder
+from .flx_value import (FlxValue)
+from .flx_views import (view, FlxMapView, FlxSequenceView)
+
+
+class MyTestCase(unittest.TestCase):
+    value = {
+        "user": {"id": 7, "name": "Max"},
+        "items": [{"price": 1.5}, {"price": 2.5}],
+        "tags": ["a", "b", "c"],
+        "pos": [1.5, 2.5],
+        "data": b"\x01",
+        "nothing": None,
+    }
+
+    def test_mapping(self):
+        flx = view(FlxBuilder.fromValue(self.value))
+        self.assertIsInstance(flx, collections.abc.Mapping)
+        self.assertEqual(len(flx), 6)
+        self.assertEqual(list(flx.keys()), sorted(self.value.keys()))
+        self.assertEqual(flx["user"]["name"], "Max")
+        self.assertEqual(flx.get("missing", 1), 1)
+        self.assertIsNone(flx["nothing"])
+        self.assertIn("nothing", flx)
+        self.assertNotIn("missing", flx)
+        self.assertNotIn(1, flx)
+        self.assertRaises(KeyError, lambda: flx["missing"])
+        self.assertEqual(dict(flx["user"].items()), {"id": 7, "name": "Max"})
+        self.assertEqual(flx, self.value)
+
+    def test_sequence(self):
+        flx = FlxValue.from_bytes(FlxBuilder.fromValue(self.value)).view()
+        tags = flx["tags"]
+        self.assertIsInstance(tags, collections.abc.Sequence)
+        self.assertEqual(tags[-1], "c")
+        self.assertEqual(tags[1:], ["b", "c"])
+        self.assertEqual(list(reversed(tags)), ["c", "b", "a"])
+        self.assertEqual(tags.index("b"), 1)
+        self.assertIn("a", tags)
+        self.assertRaises(IndexError, lambda: tags[3])
+        self.assertEqual(flx["pos"], [1.5, 2.5])
+        self.assertEqual(flx["items"][1]["price"], 2.5)
+        self.assertEqual(FlxValue.from_bytes(FlxBuilder.fromValue(1)).view(), 1)
+
+    def test_cache(self):
+        flx = view(FlxBuilder.fromValue(self.value), cache=2)
+        user = flx["user"]
+        self.assertIs(flx["user"], user)
+        flx["items"]
+        flx["tags"]
+        self.assertIsNot(flx["user"], user)
+        flx = view(FlxBuilder.fromValue(self.value), cache=None)
+        self.assertIsNot(flx["user"], flx["user"])
+        self.assertIsInstance(flx["user"], FlxMapView)
+        self.assertIsInstance(flx["tags"], FlxSequenceView)
+
+
+if __name__ == '__main__':
+    unittest.main()